@@ -3,63 +3,63 @@
 from vsdConnect import connectVSD
 import sys
 import argparse
+import logging
+from pathlib import Path
 
 parser = argparse.ArgumentParser(description='Download original image files from SMIR to a specific folder.')
 parser.add_argument('--targetFolder', dest='targetFolder', default="./",
                    help='folder to store images in')
 parser.add_argument('--sourceProject', dest='targetProject', required=0,
                    help='Project/Folder Name of VSD (sub folder of SSMProjects)')
-parser.add_argument('--sourceFolderID', dest='sourceFolderID', required=0,
+parser.add_argument('--sourceFolderID', dest='sourceFolderID', required=0, type=int,
                    help='VSD ID of fodler to download')
 parser.add_argument('--sourceFolderName', dest='sourceFolderName', required=0,
                    help='Folder name of folder to download, must be unique, can contain parentfolders, does not need to be complete')
+parser.add_argument('--notRecursive', action='store_true',
+                   help='do not download the subfolders')
+parser.add_argument('--zip', action='store_true',
+                   help='download every object as ZIP archive instead of its files')
+parser.add_argument('--workers', dest='workers', default=4, type=int,
+                   help='number of objects downloaded at the same time')
+parser.add_argument('--loglevel', default='INFO', help='Log level [CRITICAL, ERROR, WARNING, INFO, DEBUG] default is info')
 
 
 
 args=parser.parse_args()
+logging.basicConfig(level=args.loglevel)
 
-if (args.targetProject=="" and args.sourceFolderID=="" and args.sourceFolderName==""):
-    print "Arguments incomplete, need either ID or name of VSD folder"
+if not (args.targetProject or args.sourceFolderID or args.sourceFolderName):
+    print("Arguments incomplete, need either ID or name of VSD folder")
     sys.exit()
 
-#con=connectVSD.VSDConnecter("username","password")
-#con=connectVSD.VSDConnecter()
+con=connectVSD.VSDConnecter()
+#con=connectVSD.VSDConnecter(username="username", password="password")
 
 
 
-print "Arguments:",args
-if args.sourceFolderID==None:
+print("Arguments:",args)
+if args.sourceFolderID is None:
     #get information of all folders and search for the correct one
-    print "Retrieving folder list from SMIR.."
-    folderList=con.getFolderList()
-    folderHash=con.readFolders(folderList)
+    print("Retrieving folder list from SMIR..")
+    folderIndex=con.buildFolderIndex()
     OriginalFolder=None
-    if (args.targetProject != ""):
-        targetProject=args.targetProject
-
-        
-        print "Retrieving target folder IDs from folder list."
+    if args.targetProject:
+        print("Retrieving target folder IDs from folder list.")
         searchstring="SSMPipeline/"+args.targetProject+"/01_Original"
-        for key,folder in folderHash.iteritems():
-            if searchstring in folder.fullName:
-                OriginalFolder=folder
     else:
-        for key,folder in folderHash.iteritems():
-            if args.sourceFolderName in folder.fullName:
-                OriginalFolder=folder
-    if OriginalFolder==None:
-        print "Error retrieving folder, exiting"
+        searchstring=args.sourceFolderName
+    for key,folder in folderIndex.items():
+        if searchstring in folderIndex.getPath(key):
+            OriginalFolder=folder
+    if OriginalFolder is None:
+        print("Error retrieving folder, exiting")
         sys.exit()
-    print "Retrieving file list from folder with ID", OriginalFolder.ID
-    fileIDList=OriginalFolder.containedObjects.keys()
 else:
-    fileList=con.getFileListInFolder(args.sourceFolderID)
-    fileIDList=con.getFileIDs(fileList)
-
-
-for ID in fileIDList:
-    print ID
-    filename=con.generateBaseFilenameFromOntology(ID)
-    filename=args.targetFolder+"/"+filename
-    con.downloadFile(ID,filename)
+    OriginalFolder=con.getFolder(args.sourceFolderID)
 
+print("Downloading folder", OriginalFolder.name, "with ID", OriginalFolder.id)
+result=con.downloadFolder(OriginalFolder, Path(args.targetFolder), recursive=not args.notRecursive,
+                          maxWorkers=args.workers, asZip=args.zip)
+print(result)
+for objUrl, error in result.failedObjects:
+    print("Download of object", objUrl, "failed:", error)
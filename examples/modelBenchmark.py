@@ -0,0 +1,108 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* Benchmark of the model layer: parse cost per 10k objects and folders, as createAPIObject does it
+* python version: 3
+
+To compare with the former jsonmodels based models (pip install jsonmodels), save them next to this script:
+
+    git show <revision before the slotted models>:vsdConnect/models.py > models_jsonmodels.py
+    python modelBenchmark.py --before models_jsonmodels.py
+
+"""
+
+import sys
+import time
+import argparse
+import importlib.util
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'vsdConnect'))
+import models as vsdModels
+
+
+def objectJson(i):
+    # a RawImage as returned by GET objects/{id}
+    url = 'https://demo.virtualskeleton.ch/api/'
+    return {
+        'id': i, 'selfUrl': url + 'objects/%d' % i, 'name': 'CT_%d' % i, 'description': 'benchmark object',
+        'createdDate': '2016-05-04T12:00:00', 'ontologyCount': 2, 'downloadUrl': url + 'objects/%d/download' % i,
+        'type': {'selfUrl': url + 'object_types/1', 'name': 'RawImage', 'displayName': 'Raw Image',
+                 'displayNameShort': 'IMG'},
+        'objectPreviews': [{'selfUrl': url + 'previews/%d' % (2 * i + k)} for k in range(2)],
+        'objectGroupRights': [{'selfUrl': url + 'object-group-rights/%d' % i}],
+        'objectUserRights': [{'selfUrl': url + 'object-user-rights/%d' % i}],
+        'license': {'selfUrl': url + 'licenses/1'},
+        'files': {'totalCount': 3, 'pagination': {'rpp': 25, 'page': 1},
+                  'items': [{'selfUrl': url + 'files/%d' % (3 * i + k)} for k in range(3)]},
+        'rawImage': {'sliceThickness': 1.5, 'kilovoltPeak': 120, 'spaceBetweenSlices': None,
+                     'modality': {'selfUrl': url + 'modalities/3'}},
+    }
+
+
+def folderJson(i):
+    url = 'https://demo.virtualskeleton.ch/api/'
+    return {
+        'id': i, 'selfUrl': url + 'folders/%d' % i, 'name': 'folder_%d' % i, 'level': 2,
+        'parentFolder': {'selfUrl': url + 'folders/1'},
+        'childFolders': [{'selfUrl': url + 'folders/%d' % (10 * i + k)} for k in range(3)],
+        'containedObjects': [{'selfUrl': url + 'objects/%d' % (10 * i + k)} for k in range(10)],
+        'folderGroupRights': [], 'folderUserRights': [],
+    }
+
+
+def parseObject(models, data, parseTwice):
+    # createAPIObject: the type name selects the model class
+    if parseTwice:
+        typeName = models.APIObject(**data).type.name  # former createAPIObject
+    else:
+        typeName = data['type']['name']
+    return getattr(models, typeName)(**data)
+
+
+def bench(label, func, items, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    perTenK = best * 10000. / len(items)
+    print('{0:<40} {1:8.1f} ms / 10k'.format(label, perTenK * 1000.))
+    return perTenK
+
+
+def run(models, name, parseTwice, objects, folders, repeat):
+    results = dict()
+    results['objects'] = bench('{0}: objects'.format(name), lambda d: parseObject(models, d, parseTwice), objects,
+                               repeat)
+    results['folders'] = bench('{0}: folders'.format(name), lambda d: models.APIFolder(**d), folders, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='parse cost of the models per 10k objects')
+    parser.add_argument('--before', default=None, help='former models.py (jsonmodels) to compare with')
+    parser.add_argument('-n', dest='n', default=10000, type=int, help='number of objects')
+    parser.add_argument('--repeat', default=3, type=int, help='runs, the best is reported')
+    args = parser.parse_args()
+
+    objects = [objectJson(i) for i in range(args.n)]
+    folders = [folderJson(i) for i in range(args.n)]
+
+    after = run(vsdModels, 'slotted', False, objects, folders, args.repeat)
+    if args.before:
+        spec = importlib.util.spec_from_file_location('models_before', args.before)
+        before = importlib.util.module_from_spec(spec)
+        sys.modules['models_before'] = before  # jsonmodels imports the module to resolve lazy types
+        spec.loader.exec_module(before)
+        old = run(before, 'jsonmodels', True, objects, folders, args.repeat)
+        for key in after:
+            print('{0:<40} {1:8.1f} x faster'.format(key, old[key] / after[key]))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,45 +5,20 @@ import importlib
 import sys
 import argparse
 import logging
-import requests
 from pathlib import Path
 import glob
-import time
 import dicom  #pip install pydicom
 #importlib.reload(connectVSD)
 
-def UploadFiles(filenames, con, retry):
-    uploadedObjects= {}
-    filesInError = []
-    nfiles = len(filenames)
-    printinfo = range(0,nfiles, int(nfiles/100)+1)
-    for i,f in enumerate(filenames):
-        res = None
-        uploadAttempts = 0
-        while(res is None or isinstance(res,int )) and uploadAttempts <= retry :
-            if not res in [401] : #if not authorized access will be blocked
-                infostr = "%2.0f%% Uploading file %s [%s]" %(i/nfiles*100,f, uploadAttempts)
-                if uploadAttempts>0 or i %10 ==0:
-                    logging.info(infostr)
-                else:
-                    logging.debug(infostr)
-                res = con.uploadFile(f)
-                time.sleep(1)
-                uploadAttempts += 1
-                if isinstance(res,int):
-                    logging.info(requests.status_codes._codes[res][0])
-        try:
-            fileUrl = res.selfUrl
-            fileAPIObject = con.getFile(fileUrl)
-            lastFileObject = fileAPIObject.objects[-1]['selfUrl']
-            uploadedObjects[lastFileObject] =  uploadedObjects.get(lastFileObject,[])  +[(fileUrl,f )] #[(fileUrl,fileLcoalPath),(fileUrl,fileLocalPath)]
-        except:
-            filesInError.append(f)
-            if isinstance(res, int):
-                status_description = requests.status_codes._codes[res][0]
-                logging.error('Upload of file %s not successful. %s %s ' %(f, res, status_description ) )
-            else:
-                logging.error('Upload of file %s not successful.' %f, exc_info = True)
+def UploadFiles(filenames, con, retry, skipIn=None):
+    # parallel upload with retries and backoff, the owning object of each file comes from the upload response
+    # files whose hash is already in skipIn (object, folder or hashes) are not uploaded again
+    result = con.uploadFileSeries(filenames, maxAttempts=retry + 1, skipIn=skipIn)
+    logging.info(result.report)
+    uploadedObjects = result.uploadedObjects #{objectUrl: [(fileUrl,fileLocalPath),(fileUrl,fileLocalPath)]}
+    filesInError = [f for f, error in result.failedFiles]
+    for f, error in result.failedFiles:
+        logging.error('Upload of file %s not successful. %s' % (f, error))
 
 
     filesActuallyUploaded = 0
@@ -61,7 +36,8 @@ def UploadFiles(filenames, con, retry):
 
         print("%s \t: %d files \t%s\t%s" %(obj, len(uploadedObjects[obj]),firstFileLocalPath, datainfo ))
         filesActuallyUploaded +=1
-    print("Uploaded %d files in %d objects" %(len(filenames), filesActuallyUploaded) )
+    print("Uploaded %d files in %d objects, %d files (%d bytes) already on the server" %(
+        result.uploadedFiles, filesActuallyUploaded, len(result.skippedFiles), result.report.skippedBytes) )
     return uploadedObjects, filesInError
 
 def main():
@@ -145,14 +121,15 @@ def ResumeUploading(con, folderList, pattern = '*.DCM' , writeToFile = None):
         #dicomfiles = glob.glob(folder+pattern)
         nfiles = len(dicomfiles)
         row_results = [folder, nfiles]
-        upload1 =  con.uploadFile(dicomfiles[0])
+        uploaded = con.uploadFile(dicomfiles[0]) #the object to which the series belongs
+        if uploaded is None:
+            # skipped or too large for a single upload
+            logging.error("First file %s of %s not uploaded" % (dicomfiles[0], folder))
+            results_list.append(row_results)
+            continue
+        upload1, id_info = uploaded
         logging.debug(upload1)
-        if isinstance(upload1,int):
-            logging.error(connectVSD.statusDescription(upload1))
-        fileAPIObject = con.getFile(upload1.selfUrl)
-        print(connectVSD.statusDescription(fileAPIObject))
-        VSDid = fileAPIObject.objects[-1]['selfUrl']
-        id_info = con.getObject(VSDid) #info on the object to which the file belongs
+        VSDid = id_info.selfUrl
 
         nfiles_uploaded = len(id_info.files)
         datainfo = ""
@@ -163,8 +140,8 @@ def ResumeUploading(con, folderList, pattern = '*.DCM' , writeToFile = None):
         except:
             pass
         print('File %s uploaded to object %s [%d / %d files] \t %s' %(upload1.selfUrl, Path(VSDid).name, len(id_info.files), nfiles, datainfo))
-        #suppose that the files were uplaoded in the same order
-        uploadedObjects, filesInError = UploadFiles([Path(i) for i in dicomfiles[nfiles_uploaded:]], con, 3)
+        #the files already in the object are skipped by hash
+        uploadedObjects, filesInError = UploadFiles(dicomfiles[1:], con, 3, skipIn=id_info)
         id_info2 = con.getObject(VSDid)
         if not(len(id_info2.files) == nfiles):
             logging.error("Uploaded %d files of %d "  %(len(id_info2.files) ,nfiles) )
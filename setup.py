@@ -30,9 +30,10 @@ class sdist_git(sdist):
 install_requires = [
                     'requests',
                     'pyjwt>1.3',
-                    'jsonmodels',
                     'six']
 major_python_version, minor_python_version, _, _, _ = sys.version_info
+if major_python_version < 3:
+    install_requires.append('futures')
 if major_python_version < 3 or (major_python_version == 3 and minor_python_version < 4):
     install_requires.append('pathlib')
 
@@ -43,6 +44,12 @@ setup(
     packages = ['vsdConnect'],
     long_description = open('README.md').read(),
     install_requires = install_requires,
+    extras_require = {
+        'async': ['aiohttp'],
+        'fastjson': ['orjson'],
+        'table': ['numpy'],
+        'parquet': ['numpy', 'pyarrow'],
+    },
     url = 'https://github.com/SICASFoundation/vsdConnect'
 
 )
@@ -0,0 +1,404 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* asyncio client for the VSD API, mirrors connectVSD.VSDConnecter
+* python version: 3.6+
+* requires aiohttp (pip install vsdConnect[async])
+
+"""
+
+import asyncio
+import math
+import logging
+from datetime import datetime
+from calendar import timegm
+from pathlib import Path
+
+import jwt
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import connectVSD
+import models as vsdModels
+import jsonCodec as vsdJsonCodec
+
+logger = logging.getLogger(__name__)
+
+
+class _HeaderHolder:
+    # minimal request stand-in, lets the requests auth classes of connectVSD fill the headers
+    def __init__(self):
+        self.headers = {}
+
+
+class AsyncVSDConnecter:
+    """
+    asyncio connector to the VSD API. Same authentication types, resources and models as VSDConnecter,
+    but every request method is a coroutine. Use it as an async context manager or call close() when done::
+
+        async with AsyncVSDConnecter(username='...', password='...') as api:
+            objects = await asyncio.gather(*[api.getObject(i) for i in ids])
+    """
+
+    def __init__(
+            self,
+            authtype='jwt',
+            url="https://demo.virtualskeleton.ch/api/",
+            username="demo@virtualskeleton.ch",
+            password="demo",
+            version="",
+            token=None,
+            maxConcurrency=100,
+    ):
+        if aiohttp is None:
+            raise ImportError('AsyncVSDConnecter requires aiohttp (pip install aiohttp)')
+
+        self.version = version
+        self.url = url + version
+        self.authtype = authtype
+        self.username = username
+        self.password = password
+        self.token = token
+        self.maxAttempts = 3
+        self.maxAttempts401 = 2
+        self.backoff = 0.5  # seconds before the first retry, doubled at every further attempt
+        self.maxBackoff = 30.
+        self.maxConcurrency = maxConcurrency
+        self.downloadBufferSize = 1024 * 1024
+        self.jsonCodec = vsdJsonCodec.getCodec()
+        self._session = None
+        self._semaphore = None
+
+        if version:
+            self.version = str(version) + '/'
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _getSession(self):
+        # aiohttp sessions and semaphores must be created inside the running loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+            self._semaphore = asyncio.Semaphore(self.maxConcurrency)
+        return self._session
+
+    ######################################################
+    # session management
+    ########################################################
+
+    # helpers without I/O are shared with the blocking connector
+    fullUrl = connectVSD.VSDConnecter.fullUrl
+    parseUrl = connectVSD.VSDConnecter.parseUrl
+    getOID = connectVSD.VSDConnecter.getOID
+    getAPIObjectType = connectVSD.VSDConnecter.getAPIObjectType
+    createAPIObject = connectVSD.VSDConnecter.createAPIObject
+    fileObjectVersion = connectVSD.VSDConnecter.fileObjectVersion
+    remainingPageNumbers = connectVSD.VSDConnecter.remainingPageNumbers
+    _jsonBody = connectVSD.VSDConnecter._jsonBody
+
+    def _tokenExpired(self):
+        if not self.token:
+            return True
+        payload = jwt.decode(self.token, verify=False)
+        try:
+            exp = int(payload['exp'])
+        except ValueError:
+            raise jwt.DecodeError('Expiration Time claim (exp) must be an integer.')
+        return exp < timegm(datetime.utcnow().utctimetuple())
+
+    async def _stayAlive(self):
+        """
+        checks if the JWT token has expired, if yes, request a new token
+        """
+
+        if self.authtype == 'jwt' and self._tokenExpired():
+            self.token = (await self.getJWTtoken()).tokenValue
+
+    async def getJWTtoken(self):
+        """
+        request the JWT token from the server using Basic Auth
+
+        :return: token - a authentication token
+        :rtype: APIToken
+        """
+
+        res = await self._request('GET', self.url + 'tokens/jwt',
+                                  auth=aiohttp.BasicAuth(self.username, self.password), stayAlive=False)
+        token = vsdModels.APIToken(**res)
+        try:
+            jwt.decode(token.tokenValue, verify=False)
+        except jwt.InvalidTokenError as e:
+            logger.error('token invalid, try using Basic Auth{0}'.format(e))
+        return token
+
+    def _authKwargs(self):
+        if self.authtype == 'basic':
+            return dict(auth=aiohttp.BasicAuth(self.username, self.password))
+        if self.authtype == 'saml':
+            holder = connectVSD.SAMLAuth(self.token)(_HeaderHolder())
+        else:
+            holder = connectVSD.JWTAuth(self.token)(_HeaderHolder())
+        headers = dict((k, v.decode('ascii') if isinstance(v, bytes) else v) for k, v in holder.headers.items())
+        return dict(headers=headers)
+
+    #################################################
+    # aiohttp wrappers
+    ################################################
+
+    async def _requestsAttempts(self, method, url, stayAlive=True, handle=None, body=None, **kwargs):
+        #     generic wrapper around aiohttp with multiple attempts, see VSDConnecter._requestsAttempts.
+        #     Error responses, connection errors and timeouts are retried after a backoff
+        #     :param handle: coroutine function reading the successful response, default: read the body
+        #     :param body: function returning the body kwargs (e.g. dict(data=FormData)) of every attempt,
+        #         for bodies that cannot be sent twice
+        #     :return: (status, headers, handle(response)), raise if error after self.maxAttempts
+        if stayAlive:
+            await self._stayAlive()
+        if 'auth' not in kwargs:
+            for key, value in self._authKwargs().items():
+                if key == 'headers':
+                    value = dict(value, **kwargs.get('headers', {}))
+                kwargs[key] = value
+        if 'params' in kwargs:
+            kwargs['params'] = dict((k, v) for k, v in kwargs['params'].items() if v is not None)
+        session = self._getSession()
+        error = None
+        for i in range(self.maxAttempts):
+            if i:
+                await asyncio.sleep(min(self.backoff * 2 ** (i - 1), self.maxBackoff))
+            attemptKwargs = dict(kwargs, **body()) if body is not None else kwargs
+            try:
+                async with self._semaphore:
+                    async with session.request(method, url, ssl=False, **attemptKwargs) as res:
+                        if res.status < 400:
+                            body = await (handle(res) if handle is not None else res.read())
+                            return res.status, res.headers, body
+                        await res.read()
+                        logger.info("Connection attempt %s/%s: %s %s" % (i, self.maxAttempts, res.status, url))
+                        if res.status == 401 and i > self.maxAttempts401:
+                            res.raise_for_status()
+                        error = res
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.info("Connection attempt %s/%s: %s %s" % (i, self.maxAttempts, e, url))
+                if i == self.maxAttempts - 1:
+                    raise
+                error = None
+        error.raise_for_status()
+
+    async def _request(self, method, url, **kwargs):
+        status, headers, body = await self._requestsAttempts(method, url, **self._jsonBody(kwargs))
+        return self.jsonCodec.loads(body)
+
+    async def _get(self, resource, **kwargs):
+        return await self._request('GET', resource, **kwargs)
+
+    async def _put(self, resource, **kwargs):
+        return await self._request('PUT', resource, **kwargs)
+
+    async def _post(self, resource, **kwargs):
+        return await self._request('POST', resource, **kwargs)
+
+    @staticmethod
+    def _formData(value, name):
+        # multipart body of a file upload, a new one is needed for every attempt
+        data = aiohttp.FormData()
+        data.add_field('file', value, filename=name)
+        return data
+
+    async def _download(self, url, filename):
+        # the file is written again from the start on every attempt, file operations run in the default executor
+        loop = asyncio.get_event_loop()
+
+        async def save(res):
+            f = await loop.run_in_executor(None, open, str(filename), 'wb')
+            try:
+                async for chunk in res.content.iter_chunked(self.downloadBufferSize):
+                    await loop.run_in_executor(None, f.write, chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
+
+        await self._requestsAttempts('GET', url, handle=save)
+
+    #################################################
+    # api objects handling (READ)
+    ################################################
+
+    async def getRequest(self, resource, rpp=None, page=None, include=None):
+        """
+        generic get request function
+
+        :param str resource: resource path
+        :param int rpp: results per page to show
+        :param int page: page nr to show, starts with 0
+        :param str include: option to include more informations
+        :return: json data result
+        :rtype: json
+        """
+
+        params = dict([('rpp', rpp), ('page', page), ('include', include)])
+        return await self._get(self.fullUrl(resource), params=params)
+
+    async def getPaginated(self, resource):
+        """
+        get paginated object
+        """
+
+        return vsdModels.APIPagination(**(await self.getRequest(resource)))
+
+    async def iterateAllPaginated(self, resource, func=dict, concurrent=False):
+        """
+        async iterator over all items of a paginated resource::
+
+            async for obj in api.iterateAllPaginated('objects/unpublished', api.createAPIObject):
+                ...
+
+        :param str resource: resource path
+        :param func: function for converting resource
+        :param bool concurrent: fetch all the pages following the first one at once
+        :return: async iterator of items
+        :rtype: dict or model object
+        """
+
+        page = await self.getPaginated(resource)
+        for item in page.items:
+            yield func(**item)
+
+        if concurrent:
+            rpp = page.pagination.rpp
+            pages = [self.getRequest(resource, rpp=rpp, page=pageNr) for pageNr in self.remainingPageNumbers(page)]
+            for res in await asyncio.gather(*pages):
+                for item in vsdModels.APIPagination(**res).items:
+                    yield func(**item)
+            return
+
+        while page.nextPageUrl:
+            page = await self.getPaginated(page.nextPageUrl)
+            for item in page.items:
+                yield func(**item)
+
+    async def getObject(self, resource):
+        """retrieve an object based on the objectID
+
+        :param int,str resource: (str) selfUrl of the object or the (int) object ID
+        :return: the object
+        :rtype: APIObject
+        """
+
+        res = await self.getRequest(self.parseUrl(resource, 'objects'))
+        return self.createAPIObject(res)
+
+    async def getFolder(self, resource):
+        """retrieve an folder based on the folderID
+
+        :param int,str resource: (str) selfUrl of the folder or the (int) folder ID
+        :return: the folder
+        :rtype: APIFolder
+        """
+
+        res = await self.getRequest(self.parseUrl(resource, 'folders'))
+        return vsdModels.APIFolder(**res)
+
+    async def getFile(self, resource):
+        """
+        return a APIFile object
+
+        :param str resource: resource path
+        :return: api file object
+        :rtype: APIFile
+        """
+
+        res = await self.getRequest(self.parseUrl(resource, 'files'))
+        return vsdModels.APIFile(**res)
+
+    async def downloadObject(self, obj, wp=None):
+        """
+        download the object into a ZIP file based on the object name and the working directory
+
+        :param APIObject obj: object
+        :param Path wp: workpath, where to store the zip
+        """
+
+        fp = Path(obj.name).with_suffix('.zip')
+        if wp:
+            fp = Path(wp, fp)
+        await self._download(self.fullUrl(obj.downloadUrl), fp)
+
+    #################################################
+    # api objects handling (MODIFY)
+    ################################################
+
+    async def uploadFile(self, filename):
+        """
+        push (post) a file to the server
+
+        :param Path filename: the file to be uploaded
+        :return: the file object and the related object
+        :rtype: (APIFile, APIObject)
+        """
+
+        name = filename.name
+        ##workaround for file without file extensions
+        if filename.suffix == '':
+            name = filename.with_suffix('.dcm').name
+        opened = list()
+
+        def body():
+            # the file is opened again for every attempt
+            f = filename.open(mode='rb')
+            opened.append(f)
+            return dict(data=self._formData(f, name))
+
+        try:
+            res = await self._post(self.url + 'upload', body=body)
+        finally:
+            for f in opened:
+                f.close()
+        return await asyncio.gather(self.getFile(res['file']['selfUrl']),
+                                    self.getObject(res['relatedObject']['selfUrl']))
+
+    async def chunkFileUpload(self, fp, chunksize=1024 * 4096):
+        """
+        upload large files in chunks of max 100 MB size
+
+        :param Path fp: the file to upload
+        :param int chunksize: size in bytes of the chunk parts, default is 4MB
+        :return: the file object and the related object
+        :rtype: (APIFile, APIObject)
+        """
+
+        parts = math.ceil(fp.stat().st_size / float(chunksize))
+        maxchunksize = 1024 * 1024 * 100
+        if chunksize >= maxchunksize:
+            print(
+                'not uploaded: defined chunksize {0} is bigger than the allowed maximum {1}'.format(chunksize, maxchunksize))
+            return None
+
+        with fp.open('rb') as f:
+            part = 0
+            while True:
+                chunk = f.read(chunksize)
+                if not chunk:
+                    break
+                part += 1
+                logger.debug('({2})uploading part {0} of {1}'.format(part, parts, fp.name))
+                await self._post(self.fullUrl('chunked_upload?chunk={0}'.format(part)),
+                                 body=lambda: dict(data=self._formData(chunk, str(fp.name))))
+
+        res = await self._post(self.fullUrl('chunked_upload/commit?filename={0}'.format(fp.name)))
+        return await asyncio.gather(self.getFile(res['file']['selfUrl']),
+                                    self.getObject(res['relatedObject']['selfUrl']))
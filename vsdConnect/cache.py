@@ -0,0 +1,248 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* caching of GET responses and preview images for connectVSD
+* python version: 3
+
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import collections
+
+try:  # if PYTHON3:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# seconds a response stays valid, by resource type (collection name in the url)
+defaultTTL = {
+    'objects': 60,
+    'files': 300,
+    'folders': 60,
+    'licenses': 3600,
+    'modalities': 3600,
+    'object_rights': 3600,
+    'groups': 600,
+    'users': 600,
+    'ontologies': 3600,
+}
+
+
+def resourceType(url):
+    """
+    extract the resource type of an url: the last path segment that is not an id
+
+    :param str url: full url, e.g. https://demo.virtualskeleton.ch/api/objects/12
+    :return: resource type, e.g. objects
+    :rtype: str
+    """
+
+    for segment in reversed(urlparse(url).path.strip('/').split('/')):
+        if segment and not segment.isdigit():
+            return segment
+    return ''
+
+
+class ResourceCache(object):
+    """
+    in-memory cache of GET response bodies keyed by the full url (query included).
+    Entries expire after a time to live depending on the resource type, the least recently used entry is evicted
+    when more than maxsize entries are stored. Thread safe.
+
+    :param int maxsize: maximum number of entries
+    :param int ttl: default time to live in seconds
+    :param dict ttlByType: time to live by resource type, updates defaultTTL
+    """
+
+    def __init__(self, maxsize=2048, ttl=60, ttlByType=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttlByType = dict(defaultTTL)
+        if ttlByType:
+            self.ttlByType.update(ttlByType)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()  # key -> (expires, body)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        :param str key: full url
+        :return: the stored body or None if missing or expired
+        :rtype: bytes
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, body):
+        ttl = self.ttlByType.get(resourceType(key), self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, url):
+        """
+        remove the entries of an url, including its query variants and, for a single resource
+        (e.g. objects/12), its sub resources (objects/12/files)
+
+        :param str url: full url
+        :return: number of removed entries
+        :rtype: int
+        """
+
+        url = url.rstrip('/')
+        prefixes = (url + '?', url + '/') if url.rsplit('/', 1)[-1].isdigit() else (url + '?',)
+        with self._lock:
+            keys = [k for k in self._entries if k == url or k.startswith(prefixes)]
+            for k in keys:
+                del self._entries[k]
+        if keys:
+            logger.debug('cache: invalidated %d entries of %s' % (len(keys), url))
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: hits, misses, evictions and current size
+        :rtype: dict
+        """
+
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, size=len(self._entries))
+
+
+class ValidatorStore(object):
+    """
+    persistent store of the ETag / Last-Modified validators and bodies of GET responses, kept in a SQLite file.
+    Used by VSDConnecter to send conditional requests (If-None-Match / If-Modified-Since) and to serve
+    304 Not Modified answers from the stored body. Survives process restarts. Thread safe.
+
+    :param str path: SQLite database file, ':memory:' for a non persistent store
+    """
+
+    def __init__(self, path='vsdConnect-validators.sqlite'):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS validators '
+                             '(url TEXT PRIMARY KEY, etag TEXT, lastModified TEXT, body BLOB, stored REAL)')
+
+    def get(self, url):
+        """
+        :param str url: full url
+        :return: (etag, lastModified, body) or None
+        :rtype: tuple
+        """
+
+        with self._lock:
+            row = self._db.execute('SELECT etag, lastModified, body FROM validators WHERE url = ?',
+                                   (url,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], bytes(row[2])
+
+    def put(self, url, etag, lastModified, body):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?)',
+                             (url, etag, lastModified, sqlite3.Binary(body), time.time()))
+
+    def invalidate(self, url):
+        """
+        remove the validators of an url, with the same matching as ResourceCache.invalidate
+
+        :param str url: full url
+        """
+
+        url = url.rstrip('/')
+        patterns = [_likeEscape(url) + '?%']
+        if url.rsplit('/', 1)[-1].isdigit():
+            patterns.append(_likeEscape(url) + '/%')
+        with self._lock, self._db:
+            for pattern in patterns:
+                self._db.execute("DELETE FROM validators WHERE url = ? OR url LIKE ? ESCAPE '\\'", (url, pattern))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM validators')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class PreviewCache(object):
+    """
+    on-disk cache of preview images, one file per preview id and size (<path>/<id>_thumbnail, <path>/<id>_image).
+    Previews do not change once generated, entries never expire. Thread safe.
+
+    :param str path: cache directory
+    """
+
+    def __init__(self, path='vsdConnect-previews'):
+        self.path = str(path)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def _file(self, previewId, thumbnail):
+        return os.path.join(self.path, '{0}_{1}'.format(previewId, 'thumbnail' if thumbnail else 'image'))
+
+    def get(self, previewId, thumbnail=True):
+        """
+        :param int previewId: id of the preview
+        :param bool thumbnail: thumbnail or full size image
+        :return: the image or None
+        :rtype: bytes
+        """
+
+        try:
+            with open(self._file(previewId, thumbnail), 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def put(self, previewId, thumbnail, data):
+        fp = self._file(previewId, thumbnail)
+        tmp = '{0}.{1}.tmp'.format(fp, threading.current_thread().ident)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, fp)
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(('_thumbnail', '_image')):
+                os.remove(os.path.join(self.path, name))
+
+
+def _likeEscape(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
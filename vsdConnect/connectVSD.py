@@ -17,7 +17,9 @@ CHANGES
 
 from __future__ import print_function
 
+import os
 import math
+import time
 import hashlib
 
 from datetime import datetime
@@ -34,7 +36,6 @@ except ImportError:
     from urlparse import urlparse
     from urllib import quote as urlparse_quote
 
-import json
 
 from pathlib import Path, PurePath, WindowsPath
 import requests
@@ -43,6 +44,14 @@ from requests.auth import AuthBase
 import io
 import base64
 import zlib
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+try:  # if PYTHON3:
+    import queue
+except ImportError:
+    import Queue as queue
 
 try:
     import lxml.etree as ET
@@ -50,12 +59,61 @@ except:
     import xml.etree.ElementTree as ET
 
 import models as vsdModels
+import cache as vsdCache
+import folderIndex as vsdFolderIndex
+import transfer as vsdTransfer
+import seriesUpload as vsdSeriesUpload
+import folderDownload as vsdFolderDownload
+import zipStream as vsdZipStream
+import hashing as vsdHashing
+import jsonCodec as vsdJsonCodec
+import objectTable as vsdObjectTable
 import logging
 
 logger = logging.getLogger(__name__)
 
 requests.packages.urllib3.disable_warnings()
 
+# paged listings whose content changes when a resource of the collection is written
+LISTINGS = {
+    'objects': ('objects', 'objects/unpublished', 'objects/published'),
+}
+
+
+def imapBounded(func, iterable, maxWorkers=4, maxInFlight=None):
+    """
+    apply func to every item of iterable on a pool of worker threads and yield the results in input order.
+    At most maxInFlight calls are submitted ahead of the consumer.
+
+    :param func: function called with a single item
+    :param iterable: items to process
+    :param int maxWorkers: number of worker threads
+    :param int maxInFlight: maximum number of submitted but not yet consumed calls, default maxWorkers
+    :yields: func(item) for each item, in order
+    """
+
+    if maxInFlight is None:
+        maxInFlight = maxWorkers
+    if maxWorkers <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    pending = collections.deque()
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    try:
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= maxInFlight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # consumer stopped early or a call raised: drop what was not started yet
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
 
 class SAMLAuth(AuthBase):
     """Attaches SMAL to the given Request object. extends the request package auth class"""
@@ -126,6 +184,8 @@ class VSDConnecter:
             password="demo",
             version="",
             token=None,
+            cache=None,
+            validators=None,
     ):
 
         self.version = version
@@ -135,6 +195,18 @@ class VSDConnecter:
         self.authtype = authtype
         self.maxAttempts = 3
         self.maxAttempts401 = 2
+        self.maxWorkers = 4
+        self.pageReadahead = 1
+        self.cache = cache  # e.g. vsdCache.ResourceCache()
+        self.validators = validators  # e.g. vsdCache.ValidatorStore('validators.sqlite')
+        self.previewCache = None  # e.g. vsdCache.PreviewCache('previews')
+        self.folderIndex = None  # see buildFolderIndex
+        self.uploadBufferSize = 1024 * 1024
+        self.downloadBufferSize = 1024 * 1024
+        self.downloadParallel = 4  # byte ranges downloaded at the same time, if the server accepts ranges
+        self.downloadRangeSize = 32 * 1024 * 1024  # smaller downloads are not split
+        self.hasher = vsdHashing.FileHasher()  # FileHasher(vsdHashing.HashCache(path)) to keep the hashes
+        self.jsonCodec = vsdJsonCodec.getCodec()  # fastest installed, getCodec('json') for the standard library
 
         if version:
             self.version = str(version) + '/'
@@ -219,13 +291,203 @@ class VSDConnecter:
     # requests library wrappers
     ################################################
 
-    def _download(self, url, filename):
-        r = urlparse(url)
-        res = self._requestsAttempts(self.s.get, r.geturl(), params=r.params, stream=True)
+    def _download(self, url, filename, resume=True, parallel=None, hashes=None):
+        """
+        download a resource into a file. The body is streamed in buffers of self.downloadBufferSize bytes into
+        <filename>.part, renamed to filename once complete. An interrupted download continues from the end of the
+        partial file with a Range request, guarded by If-Range with the validator (ETag or Last-Modified) stored in
+        <filename>.part.validator: a changed remote file is downloaded again from the start. If the server accepts
+        byte ranges, bodies bigger than self.downloadRangeSize are downloaded in parallel ranges into a preallocated
+        file.
+        With hashes, the SHA-1 of the body is computed while it is written (sequential download, only a resumed
+        partial file is read again) and the file is downloaded again if it matches none of them
+
+        :param str url: full url
+        :param Path filename: the target file
+        :param bool resume: continue a partial download, else start again
+        :param int parallel: number of ranges downloaded at the same time, default self.downloadParallel
+        :param list hashes: accepted SHA-1 of the file (e.g. fileHashCode, anonymizedFileHashCode)
+        :return: the file
+        :rtype: Path
+        :raises: DownloadVerificationError if the file still does not match after self.maxAttempts downloads
+        """
+
+        url = urlparse(url).geturl()
+        fp = Path(filename)
+        part = fp.with_name(fp.name + '.part')
+        statePath = fp.with_name(fp.name + '.part.json')
+        validatorPath = fp.with_name(fp.name + '.part.validator')
+        if parallel is None:
+            parallel = self.downloadParallel
+        hashes = set(h.upper() for h in hashes or [] if h) or None
+        if hashes is not None:
+            parallel = 1  # hashed in order while streamed
+        if not resume:
+            for p in (part, statePath, validatorPath):
+                if p.exists():
+                    p.unlink()
+        start = time.time()
+        for check in range(self.maxAttempts):
+            digest = self._downloadStream(url, part, statePath, validatorPath, parallel, hashes is not None)
+            if hashes is None or digest in hashes:
+                break
+            logger.warning('SHA-1 of {0} does not match ({1}), downloading again'.format(fp.name, digest))
+            part.unlink()
+        else:
+            raise vsdTransfer.DownloadVerificationError(url, digest, hashes)
+        os.replace(str(part), str(fp))
+        if validatorPath.exists():
+            validatorPath.unlink()
+        elapsed = time.time() - start
+        size = fp.stat().st_size / 1024. / 1024.
+        logger.info('downloaded {0}: {1:.2f} MB in {2:.1f} s, {3:.2f} MB/s'.format(
+            fp.name, size, elapsed, size / elapsed if elapsed > 0 else 0.))
+        return fp
+
+    def _downloadStream(self, url, part, statePath, validatorPath, parallel, verify=False):
+        """
+        download a resource into the partial file, resuming it if it exists (see _download)
+
+        :param str url: full url
+        :param Path part: the partial file
+        :param Path statePath: the range state (json) of a parallel download
+        :param Path validatorPath: the validator of the partial file of a sequential download
+        :param int parallel: number of ranges downloaded at the same time
+        :param bool verify: compute the SHA-1 of the body
+        :return: the SHA-1 (uppercase) with verify, else None
+        :rtype: str
+        """
 
-        with open(filename, 'wb') as f:
-            for chunk in res.iter_content(1024):
-                f.write(chunk)
+        # a partial file with a range state is preallocated, it is resumed range by range
+        offset = part.stat().st_size if part.exists() and not statePath.exists() else 0
+        validator = vsdTransfer.loadValidator(validatorPath) if offset else None
+        if offset and validator is None:
+            logger.info('no validator stored for {0}, downloading again'.format(part.name))
+            offset = 0
+        hasher = hashlib.sha1() if verify else None
+        if verify and offset:
+            with part.open('rb') as f:
+                for buf in iter(lambda: f.read(self.downloadBufferSize), b''):
+                    hasher.update(buf)
+        for attempt in range(self.maxAttempts):
+            if offset and validator is None:
+                offset = 0  # the file cannot be resumed without If-Range
+            headers = {'Range': 'bytes={0}-'.format(offset), 'If-Range': validator} if offset else {}
+            try:
+                res = self._requestsAttempts(self.s.get, url, headers=headers, stream=True)
+            except requests.exceptions.HTTPError as e:
+                if offset and e.response is not None and e.response.status_code == 416:
+                    offset = 0
+                    continue
+                raise
+            try:
+                if offset == 0 and parallel > 1 and self._rangesAccepted(res):
+                    res.close()
+                    self._downloadRanges(url, part, statePath, res.headers, parallel)
+                    break
+                if offset and res.status_code == 206 and not self._rangeStartsAt(res, offset):
+                    # not the requested range: fetch the whole body
+                    logger.info('unexpected Content-Range {0} for {1}, downloading again'.format(
+                        res.headers.get('Content-Range'), part.name))
+                    offset = 0
+                    continue
+                if offset and res.status_code != 206:
+                    logger.info('remote file changed or range ignored, downloading {0} again'.format(part.name))
+                    offset = 0
+                if statePath.exists():
+                    statePath.unlink()
+                if offset == 0:
+                    validator = vsdTransfer.saveValidator(validatorPath, res.headers)
+                    if verify:
+                        hasher = hashlib.sha1()
+                with part.open('r+b' if offset else 'wb') as f:
+                    f.seek(offset)
+                    f.truncate()
+                    for chunk in res.iter_content(self.downloadBufferSize):
+                        f.write(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        offset += len(chunk)
+                break
+            except requests.exceptions.RequestException as e:
+                if attempt == self.maxAttempts - 1:
+                    raise
+                logger.info('download of {0} interrupted after {1} bytes ({2}), resuming'.format(part.name, offset, e))
+            finally:
+                res.close()
+        else:
+            raise IOError('download of {0} failed after {1} attempts'.format(url, self.maxAttempts))
+        return hasher.hexdigest().upper() if hasher is not None else None
+
+    def _rangeStartsAt(self, res, offset):
+        # True if the partial response starts at offset (Content-Range: bytes <offset>-<end>/<size>)
+        contentRange = res.headers.get('Content-Range', '')
+        return contentRange.replace(' ', '').startswith('bytes{0}-'.format(offset))
+
+    def _rangesAccepted(self, res):
+        # True if the response can be fetched again in byte ranges and is big enough to be split
+        headers = res.headers
+        return (res.status_code == 200 and headers.get('Accept-Ranges', '').lower() == 'bytes' and
+                'Content-Encoding' not in headers and
+                int(headers.get('Content-Length') or 0) > self.downloadRangeSize)
+
+    def _downloadRanges(self, url, part, statePath, headers, parallel):
+        """
+        download a resource in parallel byte ranges into a preallocated file. Every range is retried on its own
+        from where it was interrupted; the completed ranges are recorded in statePath
+
+        :param str url: full url
+        :param Path part: the partial file
+        :param Path statePath: the range state (json)
+        :param dict headers: headers of a full response of the resource (Content-Length, ETag, Last-Modified)
+        :param int parallel: number of ranges downloaded at the same time
+        """
+
+        identity = dict(size=int(headers['Content-Length']), etag=headers.get('ETag'),
+                        lastModified=headers.get('Last-Modified'))
+        state = vsdTransfer.RangeDownloadState.open(statePath, identity, self.downloadRangeSize)
+        if not part.exists() or part.stat().st_size != state.size:
+            state.reset()
+            with part.open('wb') as f:
+                f.truncate(state.size)
+                if hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(f.fileno(), 0, state.size)
+        # the server answers 200 with the full body instead of 206 if the resource changed meanwhile
+        validator = identity['etag'] or identity['lastModified']
+        pending = state.pendingRanges()
+        logger.info('downloading {0} ({1} bytes) in {2} ranges, {3} at a time'.format(
+            part.name, state.size, len(pending), parallel))
+
+        def fetchRange(rng):
+            start, end = rng
+            offset = start
+            for attempt in range(self.maxAttempts):
+                rangeHeaders = {'Range': 'bytes={0}-{1}'.format(offset, end)}
+                if validator:
+                    rangeHeaders['If-Range'] = validator
+                res = self._requestsAttempts(self.s.get, url, headers=rangeHeaders, stream=True)
+                try:
+                    if res.status_code != 206:
+                        raise IOError('range request for {0} not honoured (status {1})'.format(url, res.status_code))
+                    with part.open('r+b') as f:
+                        f.seek(offset)
+                        for chunk in res.iter_content(self.downloadBufferSize):
+                            f.write(chunk)
+                            offset += len(chunk)
+                except requests.exceptions.RequestException as e:
+                    logger.info('range {0}-{1} interrupted at {2} ({3}), resuming'.format(start, end, offset, e))
+                    continue
+                finally:
+                    res.close()
+                if offset == end + 1:
+                    state.complete(start)
+                    return
+                logger.info('range {0}-{1} incomplete ({2} bytes), resuming'.format(start, end, offset - start))
+            raise IOError('range {0}-{1} of {2} failed after {3} attempts'.format(start, end, url, self.maxAttempts))
+
+        for _ in imapBounded(fetchRange, pending, maxWorkers=parallel):
+            pass
+        state.delete()
 
     def _requestsAttempts(self, method, url, *args, **kwargs):
         #     generic wrapper around request library with multiple attempts
@@ -233,36 +495,132 @@ class VSDConnecter:
         #     :param method: string of the method to call "get", "put"
         #     :param url: full  url
         #     :param args: args for request call
-        #     :param kwargs: kwargs for request call
+        #     :param kwargs: kwargs for request call, maxAttempts overrides self.maxAttempts (e.g. 1 when the
+        #         caller retries on its own)
         #     :return: request object (raise if error after self.maxAttempts)
+        maxAttempts = kwargs.pop('maxAttempts', None) or self.maxAttempts
         self._stayAlive()
-        for i in range(self.maxAttempts):
-            res = method(url, *args, **kwargs)
+        for i in range(maxAttempts):
+            try:
+                res = method(url, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                logger.info("Connection attempt %s/%s: %s %s" % (i, maxAttempts, e, url))
+                if i == maxAttempts - 1:
+                    raise
+                continue
             try:
                 res.raise_for_status()
                 return res
             except:
-                logger.info("Connection attempt %s/%s: %s %s" % (i, self.maxAttempts, res , url))
+                logger.info("Connection attempt %s/%s: %s %s" % (i, maxAttempts, res , url))
                 if res.status_code == 401 and i > self.maxAttempts401:
                     raise
         # re-raise if > max attempts
         res.raise_for_status()
 
+    def _json(self, res):
+        # decode the response body from the bytes, without text decoding
+        return self.jsonCodec.loads(res.content)
+
+    def _jsonBody(self, kwargs):
+        # serialize the json argument of a request with the codec of the connector
+        if kwargs.get('json') is not None:
+            headers = dict(kwargs.get('headers') or {})
+            headers.setdefault('Content-Type', 'application/json')
+            kwargs['headers'] = headers
+            kwargs['data'] = self.jsonCodec.dumps(kwargs.pop('json'))
+        return kwargs
+
+    def _cacheKey(self, resource, args, kwargs):
+        # full url with the query string, None if the request cannot be cached
+        if (self.cache is None and self.validators is None) or args or set(kwargs) - set(['params']):
+            return None
+        return requests.Request('GET', resource, params=kwargs.get('params')).prepare().url
+
+    def _invalidate(self, resource, data=None):
+        """
+        drop the cached responses and the stored validators of a modified resource, of the resources referenced
+        in data (with their sub resources, e.g. objects/12/files) and the paged listings of their collections
+        (objects?..., objects/unpublished, folders?...)
+
+        :param str resource: resource path or selfUrl
+        :param json data: the body sent to the server or the response of the write (e.g. of an upload)
+        """
+
+        if self.cache is None and self.validators is None:
+            return
+        urls = [self.fullUrl(resource)]
+        if isinstance(data, dict):
+            if data.get('selfUrl'):
+                urls.append(data['selfUrl'])
+            for value in data.values():  # parentFolder, relatedObject, object1, ...
+                if isinstance(value, dict) and value.get('selfUrl'):
+                    urls.append(value['selfUrl'])
+        changed = set(self._collection(url) for url in urls)
+        for collection in changed - set([None]):
+            urls.extend(self.fullUrl(listing) for listing in LISTINGS.get(collection, (collection,)))
+        for url in urls:
+            for store in (self.cache, self.validators):
+                if store is not None:
+                    store.invalidate(url)
+
+    def _collection(self, url):
+        # collection of a resource of the api: objects for objects/12/files, None for other urls
+        url = self.fullUrl(url)
+        if not url.startswith(self.url):
+            return None
+        return url[len(self.url):].split('?', 1)[0].split('/', 1)[0] or None
+
     def _get(self, resource, *args, **kwargs):  # reimplements VSDConnect.getRequest
-        return self._requestsAttempts(self.s.get, resource, *args, **kwargs).json()
+        key = self._cacheKey(resource, args, kwargs)
+        if key is None:
+            return self._json(self._requestsAttempts(self.s.get, resource, *args, **kwargs))
+
+        body = self.cache.get(key) if self.cache is not None else None
+        if body is None:
+            body = self._conditionalGet(key, resource, **kwargs)
+            if self.cache is not None:
+                self.cache.put(key, body)
+        return self.jsonCodec.loads(body)
+
+    def _conditionalGet(self, key, resource, **kwargs):
+        # GET sending the stored ETag / Last-Modified validators, a 304 answer is served from the stored body
+        stored = self.validators.get(key) if self.validators is not None else None
+        if stored is not None:
+            etag, lastModified, storedBody = stored
+            headers = dict()
+            if etag:
+                headers['If-None-Match'] = etag
+            if lastModified:
+                headers['If-Modified-Since'] = lastModified
+            kwargs['headers'] = headers
+
+        res = self._requestsAttempts(self.s.get, resource, **kwargs)
+        if stored is not None and res.status_code == requests.codes.not_modified:
+            logger.debug('not modified: %s' % key)
+            return storedBody
+
+        etag = res.headers.get('ETag')
+        lastModified = res.headers.get('Last-Modified')
+        if self.validators is not None and (etag or lastModified):
+            self.validators.put(key, etag, lastModified, res.content)
+        return res.content
 
     def _put(self, resource, *args, **kwargs):  # reimplements VSDConnect.putRequest
-        return self._requestsAttempts(self.s.put, resource, *args, **kwargs).json()
+        self._invalidate(resource, kwargs.get('json'))
+        return self._json(self._requestsAttempts(self.s.put, resource, *args, **self._jsonBody(kwargs)))
 
     def _delete(self, resource, *args, **kwargs):  # reimplements VSDConnect.postRequest
-        return self._requestsAttempts(self.s.delete, resource, *args, **kwargs).json()
+        self._invalidate(resource)
+        return self._json(self._requestsAttempts(self.s.delete, resource, *args, **kwargs))
 
     def _post(self, resource, *args, **kwargs):
         # should I avoid multiplt attempts? not idempotent, no multiple  attempts
-        return self._requestsAttempts(self.s.post, resource, *args, **kwargs).json()
+        self._invalidate(resource, kwargs.get('json'))
+        return self._json(self._requestsAttempts(self.s.post, resource, *args, **self._jsonBody(kwargs)))
 
     def _options(self, resource, *args, **kwargs):  # reimplements VSDConnect.getRequest
-        return self._requestsAttempts(self.s.options, resource, *args, **kwargs).json()
+        return self._json(self._requestsAttempts(self.s.options, resource, *args, **kwargs))
 
     #################################################
     # api objects handling
@@ -278,12 +636,12 @@ class VSDConnecter:
         :rtype: APIObject
         """
 
-        apiObject = vsdModels.APIObject(**response)
-        objectType = apiObject.type.name  # 'RawImage'
-        if objectType not in dir(vsdModels):
+        # read from the json, the object is parsed once by the caller
+        objectType = (response.get('type') or {}).get('name')  # 'RawImage'
+        obj = vsdModels.objectModel(objectType)
+        if obj is None:
             logger.warning("Unknown type %s" % objectType)
             return vsdModels.APIObject
-        obj = getattr(vsdModels, objectType)
         return obj
 
     def createAPIObject(self, response=None, **kwargs):
@@ -350,107 +708,330 @@ class VSDConnecter:
         params = dict([('rpp', rpp), ('page', page), ('include', include)])
         return self._get(self.fullUrl(resource), params=params)
 
-    def downloadZip(self, resource, fp):
+    def downloadZip(self, resource, fp, resume=True, parallel=None):
         """
-        download the zipfile into the given file (fp)
+        download the zipfile into the given file (fp), see _download for the resume and parallel modes
 
         :param str resource: download URL
         :param Path fp:  filepath
-        :return: None or status_code ok (200)
-        :rtype: int
+        :param bool resume: continue a partial download
+        :param int parallel: number of byte ranges downloaded at the same time, default self.downloadParallel
+        :return: the file
+        :rtype: Path
         """
-        try:
-            filename = fp.name  # path object
-        except:
-            filename = fp  # string
-        self._download(resource, filename)
 
-    def downloadObject(self, obj, wp=None):
+        return self._download(resource, Path(fp), resume=resume, parallel=parallel)
+
+    def downloadObject(self, obj, wp=None, resume=True, parallel=None, extract=False, memberFilter=None):
         """
-        download the object into a ZIP file based on the object name and the working directory
+        download the object into a ZIP file based on the object name and the working directory,
+        see _download for the resume and parallel modes. With extract, the members of the archive are extracted
+        into a directory named after the object while the archive is downloaded, the ZIP file is not written
 
         :param APIObject obj: object
         :param Path wp: workpath, where to store the zip
-        :return: None or filename
-        :rtype: str
+        :param bool resume: continue a partial download
+        :param int parallel: number of byte ranges downloaded at the same time, default self.downloadParallel
+        :param bool extract: extract the archive instead of saving it
+        :param memberFilter: members to extract, a suffix ('.dcm'), a tuple of suffixes or a function of the name
+        :return: None or filename, the extracted files with extract
+        :rtype: Path or list of Path
         """
 
         fp = Path(obj.name).with_suffix('.zip')
         if wp:
             fp = Path(wp, fp)
 
-        res = self._download(self.fullUrl(obj.downloadUrl), fp)
+        if extract:
+            return self._downloadExtract(self.fullUrl(obj.downloadUrl), fp.with_suffix(''), memberFilter)
+        return self._download(self.fullUrl(obj.downloadUrl), fp, resume=resume, parallel=parallel)
+
+    def _downloadExtract(self, url, target, memberFilter=None):
+        """
+        download a ZIP archive and extract its members while the response is streamed
+
+        :param str url: full url
+        :param Path target: directory the members are extracted to
+        :param memberFilter: members to extract, see ZipStreamExtractor
+        :return: the extracted files
+        :rtype: list of Path
+        """
+
+        extractor = vsdZipStream.ZipStreamExtractor(target, memberFilter, bufsize=self.downloadBufferSize)
+        for attempt in range(self.maxAttempts):
+            res = self._requestsAttempts(self.s.get, url, stream=True)
+            try:
+                # an interrupted archive is extracted again from the start
+                return extractor.extract(res.iter_content(self.downloadBufferSize))
+            except requests.exceptions.RequestException as e:
+                if attempt == self.maxAttempts - 1:
+                    raise
+                logger.info('download of {0} interrupted ({1}), extracting again'.format(url, e))
+            finally:
+                res.close()
+
+    def downloadFile(self, apiFile, fp, resume=True, parallel=None, verify=True):
+        """
+        download a single file of an object. With verify, the SHA-1 computed while downloading is compared to
+        the fileHashCode / anonymizedFileHashCode of the file and the file is downloaded again on mismatch
+        (verified downloads are sequential)
+
+        :param APIFile apiFile: the file
+        :param Path fp: local file
+        :param bool resume: continue a partial download
+        :param int parallel: number of byte ranges downloaded at the same time, default self.downloadParallel
+        :param bool verify: check the hash of the downloaded file
+        :return: the file
+        :rtype: Path
+        :raises: DownloadVerificationError
+        """
+
+        hashes = [apiFile.fileHashCode, apiFile.anonymizedFileHashCode] if verify else None
+        return self._download(self.fullUrl(apiFile.downloadUrl), Path(fp), resume=resume, parallel=parallel,
+                              hashes=hashes)
+
+    def downloadFolder(self, folder, target, recursive=True, maxWorkers=None, asZip=False, store=None):
+        """
+        download the objects of a folder (and of its subfolders) into a local directory tree. Objects are downloaded
+        on a pool of threads, files are stored by fileHashCode so that files shared by several objects are
+        downloaded once, and objects already present locally are skipped. The progress and throughput are logged
+
+        :param APIFolder folder: the folder
+        :param Path target: local directory
+        :param bool recursive: include the subfolders
+        :param int maxWorkers: number of objects downloaded at the same time, default self.maxWorkers
+        :param bool asZip: download every object as ZIP archive (downloadObject) instead of its files
+        :param Path store: directory of the file store, default <target>/.files
+        :return: counts, throughput and failed objects
+        :rtype: FolderDownloadResult
+        """
+
+        if maxWorkers is None:
+            maxWorkers = self.maxWorkers
+        downloader = vsdFolderDownload.FolderDownloader(self, maxWorkers=maxWorkers, store=store, asZip=asZip)
+        return downloader.download(folder, target, recursive=recursive)
 
     def downloadObjectPreviewImages(self, object, thumbnail=True):
-        field = 'thumbnailUrl' if thumbnail else 'imageUrl'
-        embeddedImages = []
-        for i, preview in enumerate(object.objectPreviews):
-            p_obj = vsdModels.APIPreview(**self.getRequest(preview.selfUrl))
-            img = self._requestsAttempts(self.s.get, getattr(p_obj, field))
-            embeddedImages.append(base64.b64encode(img.content))
-        return embeddedImages
+        """
+        the preview images of an object, base64 encoded (see getPreviewImages)
+
+        :param APIObject object: the object
+        :param bool thumbnail: thumbnails or full size images
+        :return: the images
+        :rtype: list of bytes
+        """
+
+        return self.getPreviewImages([object], thumbnail=thumbnail, encode=True)[object.selfUrl]
+
+    def getPreviewImages(self, objects, thumbnail=True, maxWorkers=None, encode=False):
+        """
+        retrieve the preview images of many objects concurrently. With self.previewCache, the images are kept on
+        disk by preview id and size and served from there afterwards, without any request
 
-    def getPaginated(self, resource):
+        :param list objects: APIObject, or objects with only a selfUrl (e.g. folder.containedObjects)
+        :param bool thumbnail: thumbnails or full size images
+        :param int maxWorkers: number of parallel requests, default self.maxWorkers
+        :param bool encode: base64 encode the images
+        :return: the images of every object, keyed by object selfUrl, in input order
+        :rtype: OrderedDict of list of bytes
+        """
+
+        if maxWorkers is None:
+            maxWorkers = self.maxWorkers
+
+        def complete(obj):
+            # only if objectPreviews was set: reading an unset field returns its default, an empty list
+            if isinstance(obj, vsdModels.APIObject) and obj.isSet('objectPreviews') and obj.objectPreviews is not None:
+                return obj
+            return self.getObject(obj.selfUrl)
+
+        objects = list(imapBounded(complete, objects, maxWorkers=maxWorkers))
+        tasks = [(obj.selfUrl, preview.selfUrl) for obj in objects for preview in obj.objectPreviews or []]
+        images = imapBounded(lambda task: self._previewImage(task[1], thumbnail), tasks, maxWorkers=maxWorkers)
+        result = collections.OrderedDict((obj.selfUrl, []) for obj in objects)
+        for (objUrl, _), img in zip(tasks, images):
+            result[objUrl].append(base64.b64encode(img) if encode else img)
+        return result
+
+    def _previewImage(self, previewUrl, thumbnail):
+        # the image of a preview, from self.previewCache if possible
+        previewId = self.getOID(previewUrl)
+        if self.previewCache is not None and previewId is not None:
+            img = self.previewCache.get(previewId, thumbnail)
+            if img is not None:
+                return img
+        preview = vsdModels.APIPreview(**self.getRequest(previewUrl))
+        img = self._requestsAttempts(self.s.get, preview.thumbnailUrl if thumbnail else preview.imageUrl).content
+        if self.previewCache is not None and previewId is not None:
+            self.previewCache.put(previewId, thumbnail, img)
+        return img
+
+    def getPaginated(self, resource, include=None):
         """
         get paginated object
         """
 
-        res = self.getRequest(resource)
+        res = self.getRequest(resource, include=include)
         page = vsdModels.APIPagination(**res)
         return page
 
-    def getAllPaginated(self, resource, itemlist=list()):
+    def getAllPaginated(self, resource, itemlist=None):
         """
         returns all items as list
 
         :param str rource: resource path
-        :param list itemlist: list of items
+        :param list itemlist: list to append the items to, default a new list
         :return: list of items
         :rtype: list of APIPagination objects
         """
 
-        res = self.getRequest(resource)
-        page = vsdModels.APIPagination(**res)
-        for item in page.items:
-            itemlist.append(item)
-        if page.nextPageUrl:
-            return self.getAllPaginated(page.nextPageUrl, itemlist=itemlist)
+        if itemlist is None:
+            itemlist = list()
+        for page in self.iteratePages(resource):
+            itemlist.extend(page.items)
+        return itemlist
+
+    def iteratePages(self, resource, concurrent=False, include=None):
+        """
+        iterate over the pages of a paginated resource. Only the current page and the pages fetched
+        ahead are kept in memory
+
+        :param str resource: resource path
+        :param bool concurrent: fetch the pages following the first one in parallel (self.maxWorkers threads)
+        :param str include: option to include more informations
+        :return: iterator of pages
+        :rtype: APIPagination
+        """
+
+        page = self.getPaginated(resource, include=include)
+        if concurrent:
+            yield page
+            for nextPage in self.iterateRemainingPages(resource, page, include=include):
+                yield nextPage
         else:
-            return itemlist
+            for nextPage in self.iterateNextPages(page):
+                yield nextPage
+
+    def iterateNextPages(self, page, readahead=None):
+        """
+        yield page and then follow nextPageUrl. While the caller consumes a page, a background thread
+        already fetches the following ones, keeping at most readahead pages ahead of the caller
+
+        :param APIPagination page: the first page
+        :param int readahead: number of pages fetched ahead, default self.pageReadahead (0 disables it)
+        :return: iterator of pages
+        :rtype: APIPagination
+        """
+
+        if readahead is None:
+            readahead = self.pageReadahead
+        yield page
+        if not page.nextPageUrl:
+            return
+        if readahead < 1:
+            while page.nextPageUrl:
+                page = self.getPaginated(page.nextPageUrl)
+                yield page
+            return
+
+        pages = queue.Queue(maxsize=readahead)
+        stop = threading.Event()
+
+        def produce(url):
+            try:
+                while url and not stop.is_set():
+                    nextPage = self.getPaginated(url)
+                    pages.put(nextPage)  # blocks while readahead pages are waiting
+                    url = nextPage.nextPageUrl
+                if not stop.is_set():
+                    pages.put(None)
+            except Exception as e:
+                pages.put(e)
+
+        producer = threading.Thread(target=produce, args=(page.nextPageUrl,))
+        producer.daemon = True
+        producer.start()
+        try:
+            while True:
+                nextPage = pages.get()
+                if nextPage is None:
+                    break
+                if isinstance(nextPage, Exception):
+                    raise nextPage
+                yield nextPage
+        finally:
+            # unblock the producer if the caller stopped early
+            stop.set()
+            while True:
+                try:
+                    pages.get_nowait()
+                except queue.Empty:
+                    break
 
     def iteratePageItems(self, page, func=dict):
         """
         returns all items as list
 
-        :param str resource: resource path
+        :param APIPagination page: the first page
         :param func: function for converting resource
         :return: iterator of items
         :rtype: list of dict or model object
         """
 
-        for item in page.items:
-            yield func(**item)
-
-        if page.nextPageUrl:
-            res = self.getRequest(page.nextPageUrl)
-            nextPage = vsdModels.APIPagination(**res)
-            for nextItem in self.iteratePageItems(nextPage, func=func):
-                yield nextItem
+        for nextPage in self.iterateNextPages(page):
+            for item in nextPage.items:
+                yield func(**item)
 
-    def iterateAllPaginated(self, resource, func=dict):
+    def iterateAllPaginated(self, resource, func=dict, concurrent=False, include=None):
         """
         returns all items as list
 
         :param str resource: resource path
         :param func: function for converting resource
+        :param bool concurrent: fetch the pages following the first one in parallel (self.maxWorkers threads)
+        :param str include: option to include more informations
         :return: iterator of items
         :rtype: list of dict or model object
         """
 
-        res = self.getRequest(resource)
-        page = vsdModels.APIPagination(**res)
-        for item in self.iteratePageItems(page, func):
-            yield item
+        for page in self.iteratePages(resource, concurrent=concurrent, include=include):
+            for item in page.items:
+                yield func(**item)
+
+    def remainingPageNumbers(self, page):
+        """
+        compute the page numbers following the given page, based on totalCount and pagination.rpp
+
+        :param APIPagination page: the first page of a paginated resource
+        :return: page numbers still to fetch
+        :rtype: list of int
+        """
+
+        rpp = page.pagination.rpp
+        if not rpp or not page.nextPageUrl:
+            return []
+        npages = int(math.ceil(page.totalCount / float(rpp)))
+        first = page.pagination.page or 0
+        return list(range(first + 1, first + npages))
+
+    def iterateRemainingPages(self, resource, page, include=None):
+        """
+        fetch concurrently the pages following the first page of a resource, on a pool of self.maxWorkers threads.
+        Pages are yielded in server order.
+
+        :param str resource: resource path used to retrieve the first page
+        :param APIPagination page: the first page
+        :param str include: option to include more informations
+        :yields: APIPagination
+        """
+
+        rpp = page.pagination.rpp
+
+        def fetchPage(pageNr):
+            return vsdModels.APIPagination(**self.getRequest(resource, rpp=rpp, page=pageNr, include=include))
+
+        for nextPage in imapBounded(fetchPage, self.remainingPageNumbers(page), maxWorkers=self.maxWorkers):
+            yield nextPage
 
     def getObjects(self, idList=None):
         if idList is None:
@@ -458,10 +1039,68 @@ class VSDConnecter:
         if idList in ['', 'published', 'unpublished']:
             return self.iterateAllPaginated('objects/%s' % idList, func=self.createAPIObject)
 
-        items = []
-        for curId in idList:
-            items.append(self.getObject(curId))
-        return items
+        return list(imapBounded(self.getObject, idList, maxWorkers=self.maxWorkers))
+
+    def getObjectsBulk(self, idList, maxWorkers=None):
+        """
+        retrieve many objects concurrently. Repeated ids / selfUrls are fetched only once and a failing
+        object does not stop the others
+
+        :param list idList: object ids (int) or selfUrls (str)
+        :param int maxWorkers: number of parallel requests, default self.maxWorkers
+        :return: the retrieved objects and the errors, both keyed by the given id / selfUrl, in input order
+        :rtype: (OrderedDict of APIObject, OrderedDict of Exception)
+        """
+
+        if maxWorkers is None:
+            maxWorkers = self.maxWorkers
+
+        def fetch(url):
+            try:
+                return self.getObject(url), None
+            except Exception as e:
+                return None, e
+
+        results = collections.OrderedDict()
+        errors = collections.OrderedDict()
+        urls = collections.OrderedDict()  # id / selfUrl -> full url
+        for resource in idList:
+            try:
+                urls[resource] = self.parseUrl(resource, 'objects')
+            except Exception as e:
+                urls[resource] = e
+
+        unique = [url for url in collections.OrderedDict.fromkeys(urls.values()) if not isinstance(url, Exception)]
+        fetched = dict(zip(unique, imapBounded(fetch, unique, maxWorkers=maxWorkers)))
+
+        for resource, url in urls.items():
+            obj, err = (None, url) if isinstance(url, Exception) else fetched[url]
+            if err is None:
+                results[resource] = obj
+            else:
+                logger.warning('object %s not retrieved: %s' % (resource, err))
+                errors[resource] = err
+        return results, errors
+
+    def getObjectTable(self, source='objects/published', concurrent=True, maxWorkers=None):
+        """
+        stream the objects of a listing or of a folder into a columnar table (needs numpy). The json of the
+        objects goes into the table as it arrives, no model objects are created
+
+        :param str,APIFolder source: paginated resource path of objects (e.g. 'objects/unpublished') or folder,
+            whose contained objects are retrieved in parallel
+        :param bool concurrent: fetch the pages following the first one in parallel
+        :param int maxWorkers: number of parallel requests for the objects of a folder, default self.maxWorkers
+        :return: the table
+        :rtype: ObjectTable
+        """
+
+        if isinstance(source, vsdModels.APIFolder):
+            urls = [self.fullUrl(o.selfUrl) for o in source.containedObjects or []]
+            items = imapBounded(self._get, urls, maxWorkers=maxWorkers or self.maxWorkers)
+        else:
+            items = self.iterateAllPaginated(source, concurrent=concurrent)
+        return vsdObjectTable.ObjectTable.fromItems(items)
 
     def getOID(self, selfURL):
         """
@@ -485,16 +1124,14 @@ class VSDConnecter:
         return url.rsplit('/', 2)[-2:]
 
     def _instantiateResource(self, res):
-        try:
-            pagination = vsdModels.APIPagination(**res)
-            pagination.validate() #will fail if it doesno't have totalCount
-            return pagination
-        except:
-            resourcetype, id = self.getResourceTypeAndId(res['selfUrl'])
-            if resourcetype == 'objects':
-                return self.createAPIObject(res)
-            model = vsdModels.resourceTypes[resourcetype](**res)
-            return model
+        if res.get('totalCount') is not None and res.get('pagination') is not None:
+            return vsdModels.APIPagination(**res)
+        resourcetype, id = self.getResourceTypeAndId(res['selfUrl'])
+        if resourcetype == 'objects':
+            # the object type selects the model
+            return self.createAPIObject(res)
+        model = vsdModels.resourceTypes[resourcetype](**res)
+        return model
 
     def getResource(self, url):
         res = self.getRequest(url)
@@ -563,6 +1200,52 @@ class VSDConnecter:
         if not topdown:
             yield folderObject, dirs, nondirs
 
+    def walkFolderParallel(self, folderUrl, maxWorkers=None, maxInFlight=None, completionOrder=False):
+        """
+        breadth-first walk of a folder tree, similar to walkFolder but the folders are retrieved on a pool of
+        threads. Folders already visited are skipped, which protects against cycles
+
+        :param int,str folderUrl: (str) selfUrl of the root folder or the (int) folder ID
+        :param int maxWorkers: number of parallel requests, default self.maxWorkers
+        :param int maxInFlight: maximum number of folder requests submitted at once, default 2 * maxWorkers
+        :param bool completionOrder: yield the folders as soon as they are retrieved instead of breadth-first order
+        :yields: (APIFolder, list of child folders, list of contained objects)
+        """
+
+        if maxWorkers is None:
+            maxWorkers = self.maxWorkers
+        if maxInFlight is None:
+            maxInFlight = 2 * maxWorkers
+
+        start = self.parseUrl(folderUrl, 'folders')
+        frontier = collections.deque([start])
+        visited = set([start])
+        running = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=maxWorkers)
+        try:
+            while frontier or running:
+                while frontier and len(running) < maxInFlight:
+                    running.append(executor.submit(self.getFolder, frontier.popleft()))
+                if completionOrder:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    future = next(f for f in running if f in done)
+                    running.remove(future)
+                else:
+                    future = running.popleft()
+
+                folderObject = future.result()
+                dirs = folderObject.childFolders or []
+                nondirs = folderObject.containedObjects or []
+                for child in dirs:
+                    if child.selfUrl not in visited:
+                        visited.add(child.selfUrl)
+                        frontier.append(child.selfUrl)
+                yield folderObject, dirs, nondirs
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     def checkFileInObject(self, obj, fp):
         """
         check if a local file is part of an object
@@ -578,21 +1261,50 @@ class VSDConnecter:
         filehash = self.getObjectFilesHash(obj)
 
         ## Local hash
-        BLOCKSIZE = 65536
-        hasher = hashlib.sha1()
-
-        with fp.open('rb') as afile:
-            buf = afile.read(BLOCKSIZE)
-            while len(buf) > 0:
-                hasher.update(buf)
-                buf = afile.read(BLOCKSIZE)
-        localhash = hasher.hexdigest()
+        localhash = self.hasher.hashFile(fp)
 
         if localhash.upper() in filehash:
             containted = True
 
         return containted
 
+    def getTargetHashes(self, target):
+        """
+        retrieve the file hashes (fileHashCode and anonymizedFileHashCode) of all the files of an object
+        or of all the objects contained in a folder
+
+        :param APIObject,APIFolder target: object or folder
+        :return: the hashes (uppercase)
+        :rtype: set of str
+        """
+
+        if isinstance(target, vsdModels.APIFolder):
+            objects = [vsdModels.APIObject(id=self.getOID(o.selfUrl)) for o in target.containedObjects or []]
+        else:
+            objects = [target]
+        hashes = set()
+        for obj in objects:
+            for f in self.getObjectFiles(obj):
+                for h in (f.fileHashCode, f.anonymizedFileHashCode):
+                    if h:
+                        hashes.add(h.upper())
+        return hashes
+
+    def checkFilesInTarget(self, target, fps):
+        """
+        check which local files are already part of an object or of the objects of a folder. The remote hashes are
+        retrieved once and the local files are hashed in parallel (see self.hasher)
+
+        :param APIObject,APIFolder target: object or folder
+        :param list fps: local files to test
+        :return: for every file, if contained or not
+        :rtype: OrderedDict of Path -> bool
+        """
+
+        remote = self.getTargetHashes(target)
+        local = self.hasher.hashFiles(fps)
+        return collections.OrderedDict((fp, h in remote) for fp, h in local.items())
+
     def searchTerm(self, resource, search, mode='default'):
         """ search a resource using oAuths
 
@@ -705,24 +1417,29 @@ class VSDConnecter:
         fObj = vsdModels.APIFile(**res)
         return fObj
 
-    def getObjectFiles(self, obj):
+    def getObjectFiles(self, obj, include=None):
         """
-        return a list of file objects contained in an object
+        return a list of file objects contained in an object. The files are retrieved concurrently
+        (self.maxWorkers threads); listing items already carrying fileHashCode and originalFileName
+        (e.g. thanks to include) are used as they are, without a request per file
 
         :param APIObject obj: object
+        :param str include: option to include more informations in the file listing
         :return: list of APIFile
         :rtype: list of APIFile
         """
-        filelist = list()
 
         fileurl = 'objects/{0}/files'.format(obj.id)
+        items = list(self.iterateAllPaginated(fileurl, include=include))
 
-        fl = self.iterateAllPaginated(fileurl)
+        def hydrate(item):
+            if 'fileHashCode' in item and 'originalFileName' in item:
+                return vsdModels.APIFile(**item)
+            return self.getFile(item['selfUrl'])
 
-        for f in fl:
-            res = self.getFile(f['selfUrl'])
-            filelist.append(res)
-        return filelist
+        if all('fileHashCode' in item and 'originalFileName' in item for item in items):
+            return [hydrate(item) for item in items]
+        return list(imapBounded(hydrate, items, maxWorkers=self.maxWorkers))
 
     def fileObjectVersion(self, data):
         """
@@ -783,17 +1500,23 @@ class VSDConnecter:
         :rtype: list of APIFolders
         """
 
-        search = urlparse_quote(search)
+        if self.folderIndex is not None:
+            if mode == 'exact':
+                result = self.folderIndex.getByName(search)
+            else:
+                result = self.folderIndex.getByNamePrefix(search)
+        else:
+            search = urlparse_quote(search)
 
-        if mode == 'exact':
+            if mode == 'exact':
 
-            url = self.url + "folders?$filter=Name%20eq%20%27{0}%27".format(search)
+                url = self.url + "folders?$filter=Name%20eq%20%27{0}%27".format(search)
 
-        else:
+            else:
 
-            url = self.url + "folders?$filter=startswith(Name,%27{0}%27)%20eq%20true".format(search)
+                url = self.url + "folders?$filter=startswith(Name,%27{0}%27)%20eq%20true".format(search)
 
-        result = list(self.iterateAllPaginated(url, vsdModels.APIFolder))
+            result = list(self.iterateAllPaginated(url, vsdModels.APIFolder))
 
         if len(result) == 1 and squeeze:
             folder = result[0]
@@ -877,40 +1600,31 @@ class VSDConnecter:
         res = self.getRequest(resource)
         mod = vsdModels.APIModality(**res)
 
+    def buildFolderIndex(self):
+        """
+        scan the folders collection once and keep a local index of the folder tree (self.folderIndex).
+        While the index is set, getFolderByName, postFolder and createFolderStructure use it instead of
+        requesting every child folder. Call it again (or self.folderIndex.refresh()) to update the index
+
+        :return: the folder index
+        :rtype: FolderIndex
+        """
+
+        if self.folderIndex is None:
+            self.folderIndex = vsdFolderIndex.FolderIndex(self)
+        return self.folderIndex.refresh()
+
     def readFolders(self, folderList):
-        # first pass: create one entry for each folder:
-        folderHash = {}
-        for folder in folderList['items']:
-            ID = folder['id']
-            folderHash[ID] = vsdModels.APIFolder()
-            folderHash[ID].ID = ID
-            folderHash[ID].name = folder['name']
-            folderHash[ID].childFolders = []
-
-            # second pass: create references to parent and child folders
-        for folder in folderList['items']:
-            ID = folder['id']
-            if (folder['childFolders'] != None):
-                # print (folder['childFolders'],ID)
-                for child in folder['childFolders']:
-                    childID = int(child['selfUrl'].split("/")[-1])
-                    if (folderHash.has_key(childID)):
-                        folderHash[ID].childFolders.append(folderHash[childID])
-            if (folder['parentFolder'] != None):
-                parentID = int(folder['parentFolder']['selfUrl'].split("/")[-1])
-                if (folderHash.has_key(parentID)):
-                    folderHash[ID].parentFolder = folderHash[parentID]
-            if (not folder['containedObjects'] == None):
-                folderHash[ID].containedObjects = {}
-                for obj in folder['containedObjects']:
-                    objID = obj['selfUrl'].split("/")[-1]
-                    folderHash[ID].containedObjects[objID] = obj['selfUrl']
-
-        # third pass: gett full path names in folder hierarchy
-        for key, folder in folderHash.iteritems():
-            folder.getFullName()
-
-        return folderHash
+        """
+        index a list of folders
+
+        :param json folderList: a folders page (with items) or a list of folders
+        :return: the index, folders can be accessed by id (index[id]), path (index.getByPath) or name
+        :rtype: FolderIndex
+        """
+
+        items = folderList['items'] if isinstance(folderList, dict) else folderList
+        return vsdFolderIndex.FolderIndex(self).load(items)
 
     def getFolderContent(self, folder, recursive=False, mode='d'):
         """
@@ -1276,6 +1990,7 @@ class VSDConnecter:
         :rtype: int
         """
 
+        self._invalidate(resource)
         try:
             req = self.s.delete(self.fullUrl(resource))
             if req.status_code == requests.codes.ok:
@@ -1301,6 +2016,7 @@ class VSDConnecter:
         :rtype: int
         """
 
+        self._invalidate(obj.selfUrl)
         try:
             req = self.s.delete(obj.selfUrl)
             if req.status_code == requests.codes.ok:
@@ -1329,30 +2045,96 @@ class VSDConnecter:
                     break
                 yield (chunk)
 
-    def chunkFileUpload(self, fp, chunksize=1024 * 4096):
+    def chunkFileUpload(self, fp, chunksize=1024 * 4096, manifest=None, parallel=1, maxInFlightBytes=None,
+                        stats=None, skipIn=None, report=None):
         """
-        upload large files in chunks of max 100 MB size
+        upload large files in chunks of max 100 MB size. Each chunk is retried on its own (see maxAttempts).
+        With a manifest the acknowledged chunks are recorded on disk: calling chunkFileUpload again with the same
+        manifest after an interruption only sends the missing chunks before committing.
+        The next chunks are read from disk while the current ones are sent. If the server accepts chunks out of
+        order, parallel > 1 sends several chunks at once, bounded by maxInFlightBytes
 
         :param Path fp: the file to upload
-        :param int chunksize: size in bytes of the chunk parts, default is 4MB
+        :param int chunksize: size in bytes of the chunk parts, default is 4MB. 'auto' or an AdaptiveChunkSizer adapt
+            the size to the measured throughput (see AdaptiveChunkSizer.parameters for the chosen values)
+        :param Path manifest: file keeping the upload state, True for <file name>.upload.json next to the file
+        :param int parallel: number of chunks sent at the same time
+        :param int maxInFlightBytes: memory budget for the chunks read ahead and being sent, default 2 * parallel
+            chunks of the current chunk size
+        :param ChunkUploadStats stats: filled with the per chunk latency and the throughput
+        :param skipIn: APIObject, APIFolder or set of file hashes: the upload is skipped (returns None) if the file
+            is already there
+        :param UploadReport report: filled with the uploaded and skipped bytes
         :return: the generated object
         :rtype: APIObject
         """
-        parts = math.ceil(fp.stat().st_size / float(chunksize))
         err = False
+        if self._skipUpload(fp, skipIn, report):
+            return None
         maxchunksize = 1024 * 1024 * 100
+        sizer = None
+        if chunksize == 'auto':
+            chunksize = vsdTransfer.AdaptiveChunkSizer(maximum=maxchunksize - 1)
+        if isinstance(chunksize, vsdTransfer.AdaptiveChunkSizer):
+            sizer = chunksize
+            sizer.maximum = min(sizer.maximum, maxchunksize - 1)
+            chunksize = sizer.maximum
         if chunksize >= maxchunksize:
             print(
                 'not uploaded: defined chunksize {0} is bigger than the allowed maximum {1}'.format(chunksize, maxchunksize))
             return None
 
-        for part, chunk in enumerate(self.chunkedread(fp, chunksize),1):
-            print('({2})uploading part {0} of {1}'.format(part, parts, fp.name))
-            files = {'file': (str(fp.name), chunk)}
-            res = self._post(self.fullUrl('/chunked_upload?chunk={0}').format(part), files=files)
-            #print('uploaded part {0} of {1} '.format(part, parts))
+        if manifest is True:
+            manifest = fp.with_name(fp.name + '.upload.json')
+        state = vsdTransfer.UploadManifest.open(manifest, fp, chunksize)
+        chunksize = state.chunksize
+        size = fp.stat().st_size
+        if stats is None:
+            stats = vsdTransfer.ChunkUploadStats()
+        if maxInFlightBytes is None:
+            # in bytes of the current chunk size, which changes in adaptive mode
+            maxInFlightBytes = lambda: 2 * parallel * (sizer.nextSize() if sizer else chunksize)
+
+        # parts after the last acknowledged chunk follow at the current chunk size, only an estimate if it adapts
+        lastPart = max(state.chunks) if state.chunks else 0
+        lastEnd = sum(state.chunks[lastPart]) if lastPart else 0
+
+        def progress(part, offset, length):
+            last, end = (part, offset + length) if part > lastPart else (lastPart, lastEnd)
+            total = last + math.ceil((size - end) / float(sizer.nextSize() if sizer else chunksize))
+            return '{0} of {1}{2}'.format(part, '~' if sizer else '', total)
+
+        def postChunk(chunk):
+            part, offset, view = chunk
+            print('({1})uploading part {0}'.format(progress(part, offset, len(view)), fp.name))
+            start = time.time()
+            try:
+                # the chunk is streamed from the memory map, not copied into the request body
+                body = vsdTransfer.MultipartBufferStream(view, fp.name, bufsize=self.uploadBufferSize)
+                self._post(self.fullUrl('chunked_upload?chunk={0}'.format(part)), data=body,
+                           headers={'Content-Type': body.contentType})
+                stats.add(part, len(view), time.time() - start)
+                if sizer:
+                    sizer.record(len(view), time.time() - start)
+                state.acknowledge(part, offset, len(view))
+            finally:
+                reader.release(view)
+
+        # the chunks read ahead and being sent are bounded by maxInFlightBytes
+        chunks = state.pendingChunks(sizer.nextSize if sizer else None)
+        with vsdTransfer.ChunkReader(fp, chunks, queueSize=parallel, maxBytes=maxInFlightBytes) as reader:
+            for _ in imapBounded(postChunk, reader, maxWorkers=parallel):
+                pass
+        logger.info('uploaded {0}: {1[chunks]} chunks, {1[mbPerSecond]:.2f} MB/s, '
+                    'mean chunk latency {1[meanLatency]:.2f} s'.format(fp.name, stats.summary()))
+        if sizer:
+            logger.info('adaptive chunk size: {0}'.format(sizer.parameters()))
 
         res = self._post(self.fullUrl('chunked_upload/commit?filename={0}'.format(fp.name)))
+        state.delete()
+        if report is not None:
+            report.uploaded(fp, fp.stat().st_size)
+        self._invalidate('objects/unpublished', res)
         return self.getFile(res['file']['selfUrl']), self.getObject(res['relatedObject']['selfUrl'])
 
         # relObj = res['relatedObject']
@@ -1380,7 +2162,12 @@ class VSDConnecter:
 
         exists = False
 
-        if check:
+        if check and self.folderIndex is not None:
+            fold = self.folderIndex.getChild(parent.id, name)
+            if fold is not None:
+                print('folder {0} already exists, id: {1}'.format(name, fold.id))
+                return fold
+        elif check:
             if parent.childFolders:
                 for child in parent.childFolders:
                     fold = self.getFolder(child.selfUrl)
@@ -1402,32 +2189,97 @@ class VSDConnecter:
             # print(data)
             res = self.postRequest('folders', data=data)
             folder.populate(**res)
+            if self.folderIndex is not None:
+                self.folderIndex.update(folder)
             print('folder {0} created, has id {1}'.format(name, folder.id))
             assert folder.name == name
             return folder
 
-    def uploadFile(self, filename):
+    def uploadFile(self, filename, skipIn=None, report=None):
         """
         push (post) a file to the server
 
         :param Path filename: the file to be uploaded
+        :param skipIn: APIObject, APIFolder or set of file hashes: the upload is skipped (returns None) if the file
+            is already there
+        :param UploadReport report: filled with the uploaded and skipped bytes
         :return: the file object containing the related object selfUrl
         :rtype: APIObject
         """
 
+        if self._skipUpload(filename, skipIn, report):
+            return None
         try:
-            data = filename.open(mode='rb').read()
-            ##workaround for file without file extensions
-            if filename.suffix == '':
-                filename = filename.with_suffix('.dcm')
-            files = {'file': (str(filename.name), data)}
+            body = self._uploadBody(filename)
         except:
             print("opening file", filename, "failed, aborting")
             return
 
-        res = self._post(self.url + 'upload', files=files)
+        res = self._upload(body)
+        if report is not None:
+            report.uploaded(filename, body.size)
         return self.getFile(res['file']['selfUrl']), self.getObject(res['relatedObject']['selfUrl'])
 
+    def uploadFileSeries(self, filenames, maxWorkers=None, maxAttempts=3, skipIn=None):
+        """
+        upload many files (e.g. the slices of a DICOM series) in parallel, with retries and backoff.
+        With skipIn, the files already on the server are not uploaded again, e.g. when resuming an
+        interrupted upload
+
+        :param list filenames: paths of the files to upload
+        :param int maxWorkers: number of files uploaded at the same time, default self.maxWorkers
+        :param int maxAttempts: upload attempts per file
+        :param skipIn: APIObject, APIFolder or set of file hashes (see getTargetHashes)
+        :return: the uploaded objects (selfUrl -> files), the skipped and the failed files
+        :rtype: SeriesUploadResult
+        """
+
+        if maxWorkers is None:
+            maxWorkers = self.maxWorkers
+        uploader = vsdSeriesUpload.SeriesUploader(self, maxWorkers=maxWorkers, maxAttempts=maxAttempts)
+        return uploader.upload(filenames, skipIn=skipIn)
+
+    def skipHashes(self, skipIn):
+        """
+        :param skipIn: APIObject, APIFolder, set of file hashes or None
+        :return: the hashes (uppercase) of the files to skip, None if nothing is skipped
+        :rtype: set of str
+        """
+
+        if skipIn is None:
+            return None
+        if isinstance(skipIn, (vsdModels.APIObject, vsdModels.APIFolder)):
+            return self.getTargetHashes(skipIn)
+        return set(h.upper() for h in skipIn)
+
+    def _skipUpload(self, fp, skipIn, report):
+        # True if the file is already in skipIn (and is accounted as skipped)
+        hashes = self.skipHashes(skipIn)
+        if hashes is None or self.hasher.hashFile(fp) not in hashes:
+            return False
+        logger.info('{0} already on the server, skipped'.format(fp.name))
+        if report is not None:
+            report.skipped(fp, fp.stat().st_size)
+        return True
+
+    def _uploadBody(self, filename):
+        name = filename.name
+        ##workaround for file without file extensions
+        if filename.suffix == '':
+            name = filename.with_suffix('.dcm').name
+        # streamed from disk in buffers of self.uploadBufferSize bytes
+        return vsdTransfer.MultipartFileStream(filename, filename=name, bufsize=self.uploadBufferSize)
+
+    def _upload(self, body, maxAttempts=None):
+        # post an upload body, returns the raw response (file and relatedObject selfUrls)
+        if not isinstance(body, vsdTransfer.MultipartFileStream):
+            body = self._uploadBody(body)
+        res = self._post(self.url + 'upload', data=body, headers={'Content-Type': body.contentType},
+                         maxAttempts=maxAttempts)
+        # the object of the file, its files and the object listings
+        self._invalidate('objects/unpublished', res)
+        return res
+
 
     #################################################
     # api objects handling (UPDATE)
@@ -1473,8 +2325,9 @@ class VSDConnecter:
         :rtype: json
         """
 
+        self._invalidate(resource)
         req = self.s.post(self.fullUrl(resource))
-        return req.json()
+        return self._json(req)
 
     def putRequestSimple(self, resource):
         """
@@ -1485,8 +2338,9 @@ class VSDConnecter:
         :rtype: json
         """
 
+        self._invalidate(resource)
         req = self.s.put(self.fullUrl(resource))
-        return req.json()
+        return self._json(req)
 
     def publishObject(self, obj):
         """
@@ -1497,6 +2351,8 @@ class VSDConnecter:
         :rtype: APIObject
         """
 
+        for resource in [obj.selfUrl, 'objects/published', 'objects/unpublished']:
+            self._invalidate(resource)
         try:
             req = self.s.put(obj.selfUrl + '/publish')
             if req.status_code == requests.codes.ok:
@@ -1690,8 +2546,8 @@ class VSDConnecter:
         if fp.is_file():
             folders.remove(folders[0])
 
-        for i in range(parents, len(folders)):
-            folders.remove(folders[i])
+        # keep the parents levels closest to the file
+        del folders[parents:]
 
         folders.reverse()
         fparent = rootfolder
@@ -1699,7 +2555,9 @@ class VSDConnecter:
         if fparent:
             for fname in folders:
                 fchild = None
-                if fparent:
+                if fparent and self.folderIndex is not None:
+                    fchild = self.folderIndex.getChild(fparent.id, fname)
+                elif fparent:
                     if fparent.childFolders:
                         for child in fparent.childFolders:
                             fold = self.getFolder(child.selfUrl)
@@ -1711,7 +2569,10 @@ class VSDConnecter:
                     f.parentFolder = vsdModels.APIFolder(selfUrl=fparent.selfUrl)
                     # f.toJson()
                     res = self.postRequest('folders', f.to_struct())
-                    fparent.populate(**res)
+                    # a new instance: fparent may be the parent given by the caller
+                    fparent = vsdModels.APIFolder(**res)
+                    if self.folderIndex is not None:
+                        self.folderIndex.update(vsdModels.APIFolder(**res))
 
                 else:
                     fparent = fchild
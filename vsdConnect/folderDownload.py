@@ -0,0 +1,260 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* concurrent download of folder trees for connectVSD, with a content addressed file store
+* python version: 3
+
+"""
+
+import os
+import re
+import time
+import shutil
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def safeName(name):
+    """
+    :param str name: folder, object or file name
+    :return: the name usable as a local file name
+    :rtype: str
+    """
+
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', str(name)).strip(' .')
+    return name or '_'
+
+
+class ContentStore(object):
+    """
+    local store of downloaded files keyed by their fileHashCode (<root>/<2 first chars>/<hash>). A file shared by
+    several objects is downloaded once and linked (hard link, copy if not supported) to its places in the tree.
+    Concurrent requests for the same hash wait for the first download. Thread safe.
+
+    :param Path root: directory of the store
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._inFlight = dict()  # hash -> lock of the download
+
+    def path(self, key):
+        return Path(self.root, key[:2], key)
+
+    def __contains__(self, key):
+        return self.path(key).exists()
+
+    def fetch(self, key, download):
+        """
+        the stored file of a hash, downloaded with download(path) if missing
+
+        :param str key: file hash
+        :param download: function writing the file to the given path
+        :return: path of the stored file and True if it was downloaded by this call
+        :rtype: tuple
+        """
+
+        fp = self.path(key)
+        with self._lock:
+            keyLock = self._inFlight.setdefault(key, threading.Lock())
+        with keyLock:
+            if fp.exists():
+                return fp, False
+            if not fp.parent.exists():
+                fp.parent.mkdir(parents=True, exist_ok=True)
+            download(fp)
+            return fp, True
+
+    @staticmethod
+    def link(source, target):
+        """
+        place a stored file in the tree, as a hard link or a copy
+
+        :return: False if target already existed
+        :rtype: bool
+        """
+
+        if target.exists():
+            return False
+        if not target.parent.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(str(source), str(target))
+        except OSError:
+            shutil.copyfile(str(source), str(target))
+        return True
+
+
+class FolderDownloadResult(object):
+    """
+    progress and outcome of a folder download
+
+    :attributes:
+        * objects: number of objects processed
+        * skippedObjects: objects already complete locally
+        * downloadedFiles: files downloaded
+        * dedupFiles: files taken from the store (shared with another object or downloaded before)
+        * downloadedBytes: bytes downloaded
+        * failedObjects: list of (object selfUrl, exception)
+    """
+
+    def __init__(self):
+        self.objects = 0
+        self.skippedObjects = 0
+        self.downloadedFiles = 0
+        self.dedupFiles = 0
+        self.downloadedBytes = 0
+        self.failedObjects = list()
+        self.start = time.time()
+        self.end = None
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+            self.end = time.time()
+
+    @property
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+    @property
+    def mbPerSecond(self):
+        elapsed = self.elapsed
+        return self.downloadedBytes / 1024. / 1024. / elapsed if elapsed > 0 else 0.
+
+    def __repr__(self):
+        return ('<FolderDownloadResult: {0} objects ({1} skipped, {2} failed), {3} files downloaded, '
+                '{4} deduplicated, {5:.1f} MB, {6:.2f} MB/s>').format(
+            self.objects, self.skippedObjects, len(self.failedObjects), self.downloadedFiles, self.dedupFiles,
+            self.downloadedBytes / 1024. / 1024., self.mbPerSecond)
+
+
+class FolderDownloader(object):
+    """
+    downloads the objects of a folder tree on a pool of threads. The local tree mirrors the folders, every object
+    is a directory <object id>_<object name> holding its files under their original names. The files come from a
+    ContentStore, so files shared by several objects are downloaded once; objects whose files are all present
+    locally are skipped. With asZip, every object is downloaded as ZIP archive (downloadObject) instead, existing
+    archives are skipped::
+
+        downloader = FolderDownloader(api, maxWorkers=8)
+        result = downloader.download(folder, Path('study'))
+
+    :param VSDConnecter connector: connector used for the downloads
+    :param int maxWorkers: number of objects downloaded at the same time
+    :param Path store: directory of the ContentStore, default <target>/.files
+    :param bool asZip: download ZIP archives of the objects
+    :param int progressEvery: log the progress every progressEvery objects
+    """
+
+    def __init__(self, connector, maxWorkers=4, store=None, asZip=False, progressEvery=10):
+        self.connector = connector
+        self.maxWorkers = maxWorkers
+        self.store = store
+        self.asZip = asZip
+        self.progressEvery = progressEvery
+
+    def _objectTasks(self, folder, target, recursive):
+        # (object selfUrl, local directory) of the objects of the tree, folders retrieved in parallel
+        localDirs = dict()
+        seen = set()
+        for folderObject, dirs, objects in self.connector.walkFolderParallel(folder.selfUrl):
+            parent = folderObject.parentFolder.selfUrl if folderObject.parentFolder else None
+            if not localDirs:
+                localDir = target
+            else:
+                localDir = Path(localDirs[parent], safeName(folderObject.name))
+            localDirs[folderObject.selfUrl] = localDir
+            for obj in objects:
+                if (obj.selfUrl, localDir) not in seen:
+                    seen.add((obj.selfUrl, localDir))
+                    yield obj.selfUrl, localDir
+            if not recursive:
+                break
+
+    def _downloadObject(self, task, store, result):
+        objUrl, localDir = task
+        obj = self.connector.getObject(objUrl)
+        if self.asZip:
+            fp = Path(localDir, safeName(obj.name)).with_suffix('.zip')
+            if fp.exists():
+                result.add(objects=1, skippedObjects=1)
+                return
+            if not localDir.exists():
+                localDir.mkdir(parents=True, exist_ok=True)
+            self.connector.downloadZip(self.connector.fullUrl(obj.downloadUrl), fp)
+            result.add(objects=1, downloadedFiles=1, downloadedBytes=fp.stat().st_size)
+            return
+
+        objDir = Path(localDir, safeName('{0}_{1}'.format(obj.id, obj.name)))
+        downloaded = dedup = nbytes = 0
+        linked = False
+        for apiFile in self.connector.getObjectFiles(obj):
+            key = apiFile.fileHashCode or 'file-{0}'.format(apiFile.id)
+            stored, fetched = store.fetch(key, lambda fp: self.connector.downloadFile(apiFile, fp))
+            if fetched:
+                downloaded += 1
+                nbytes += stored.stat().st_size
+            placed = ContentStore.link(stored, Path(objDir, safeName(apiFile.originalFileName or apiFile.id)))
+            if placed and not fetched:
+                dedup += 1
+            linked = linked or placed
+        result.add(objects=1, skippedObjects=0 if linked else 1, downloadedFiles=downloaded, dedupFiles=dedup,
+                   downloadedBytes=nbytes)
+
+    def download(self, folder, target, recursive=True):
+        """
+        download the objects of the folder
+
+        :param APIFolder folder: the folder
+        :param Path target: local directory of the folder
+        :param bool recursive: include the subfolders
+        :return: the counts and the failed objects
+        :rtype: FolderDownloadResult
+        """
+
+        target = Path(target)
+        store = ContentStore(self.store or Path(target, '.files'))
+        result = FolderDownloadResult()
+        tasks = self._objectTasks(folder, target, recursive)
+        running = dict()  # future -> object selfUrl
+        executor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+        try:
+            for task in tasks:
+                while len(running) >= 2 * self.maxWorkers:
+                    self._collect(running, result)
+                running[executor.submit(self._downloadObject, task, store, result)] = task[0]
+            while running:
+                self._collect(running, result)
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+        logger.info('download of {0} done: {1}'.format(folder.name, result))
+        return result
+
+    def _collect(self, running, result):
+        # wait for the next finished objects and report the progress
+        done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in done:
+            objUrl = running.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                logger.error('download of object {0} not successful: {1}'.format(objUrl, e))
+                result.add(objects=1)
+                result.failedObjects.append((objUrl, e))
+            if self.progressEvery and result.objects % self.progressEvery == 0:
+                logger.info('{0} objects, {1} files, {2:.1f} MB downloaded, {3:.2f} MB/s'.format(
+                    result.objects, result.downloadedFiles, result.downloadedBytes / 1024. / 1024.,
+                    result.mbPerSecond))
@@ -0,0 +1,279 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* local index of the VSD folder tree
+* python version: 3
+
+"""
+
+import copy
+import collections
+import logging
+
+import models as vsdModels
+
+logger = logging.getLogger(__name__)
+
+
+def _idFromUrl(url):
+    return int(url.rstrip('/').rsplit('/', 1)[-1])
+
+
+class FolderIndex(object):
+    """
+    index of the folder tree built from a single paginated scan of the folders collection.
+    Gives dict based lookups of folders by id, by full path ("MyProjects/Study/01_Original") and by name,
+    and the parent / children adjacency for subtree enumeration. The lookups return copies, changing them does not
+    change the index (items() gives the indexed folders themselves, read only)::
+
+        index = api.buildFolderIndex()
+        folder = index.getByPath('MyProjects/Study/01_Original')
+        for sub in index.iterSubtree(folder.id):
+            ...
+
+    :param VSDConnecter connector: connector used to scan the folders
+    :param str resource: folders collection path
+    """
+
+    sep = '/'
+
+    def __init__(self, connector=None, resource='folders'):
+        self.connector = connector
+        self.resource = resource
+        self.folders = dict()  # id -> APIFolder
+        self.parents = dict()  # id -> parent id or None
+        self.children = collections.defaultdict(list)  # id -> child ids
+        self.paths = dict()  # id -> full path
+        self.pathIds = dict()  # full path -> id
+        self.nameIds = collections.defaultdict(list)  # name -> ids
+
+    def __len__(self):
+        return len(self.folders)
+
+    def __contains__(self, folderId):
+        return folderId in self.folders
+
+    def __getitem__(self, folderId):
+        return self._copy(self.folders[folderId])
+
+    def items(self):
+        # the indexed folders, not copies: do not modify them
+        return self.folders.items()
+
+    @staticmethod
+    def _copy(folder):
+        return copy.deepcopy(folder) if folder is not None else None
+
+    ###########################################
+    # building
+    ###########################################
+
+    def refresh(self):
+        """
+        scan the folders collection once and update the index. Only new, moved or renamed folders
+        (and their subtrees) get their paths recomputed; folders missing from the scan are removed
+
+        :return: the index
+        :rtype: FolderIndex
+        """
+
+        seen = set()
+        changed = list()
+        for folder in self.connector.iterateAllPaginated(self.resource, vsdModels.APIFolder, concurrent=True):
+            seen.add(folder.id)
+            if self._store(folder):
+                changed.append(folder.id)
+        for folderId in set(self.folders) - seen:
+            self.remove(folderId)
+        self._updatePaths(changed)
+        logger.debug('folder index: %d folders, %d changed' % (len(self.folders), len(changed)))
+        return self
+
+    def load(self, items):
+        """
+        fill the index from folder items (dict or APIFolder), e.g. the items of a folders page
+
+        :param list items: folders
+        :return: the index
+        :rtype: FolderIndex
+        """
+
+        changed = list()
+        for item in items:
+            folder = item if isinstance(item, vsdModels.APIFolder) else vsdModels.APIFolder(**item)
+            if self._store(folder):
+                changed.append(folder.id)
+        self._updatePaths(changed)
+        return self
+
+    def update(self, folder):
+        """
+        add or replace a single folder, e.g. after postFolder
+
+        :param APIFolder folder: the folder
+        """
+
+        if self._store(folder):
+            self._updatePaths([folder.id])
+
+    def remove(self, folderId):
+        """
+        remove a folder from the index, its subfolders are kept (until the next refresh)
+
+        :param int folderId: id of the folder
+        """
+
+        folder = self.folders.pop(folderId, None)
+        if folder is None:
+            return
+        parentId = self.parents.pop(folderId, None)
+        if folderId in self.children.get(parentId, []):
+            self.children[parentId].remove(folderId)
+        path = self.paths.pop(folderId, None)
+        if self.pathIds.get(path) == folderId:
+            del self.pathIds[path]
+        if folderId in self.nameIds.get(folder.name, []):
+            self.nameIds[folder.name].remove(folderId)
+
+    def _store(self, folder):
+        # store a folder, returns True if its name or parent changed
+        folderId = folder.id
+        parentId = _idFromUrl(folder.parentFolder.selfUrl) if folder.parentFolder and folder.parentFolder.selfUrl else None
+        old = self.folders.get(folderId)
+        self.folders[folderId] = folder
+        if old is not None and old.name == folder.name and self.parents.get(folderId) == parentId:
+            return False
+
+        if old is not None:
+            if folderId in self.nameIds.get(old.name, []):
+                self.nameIds[old.name].remove(folderId)
+            oldParent = self.parents.get(folderId)
+            if folderId in self.children.get(oldParent, []):
+                self.children[oldParent].remove(folderId)
+        self.nameIds[folder.name].append(folderId)
+        self.parents[folderId] = parentId
+        self.children[parentId].append(folderId)
+        return True
+
+    def _updatePaths(self, folderIds):
+        # recompute the full path of the given folders and of their subtrees
+        pending = collections.deque(folderIds)
+        done = set()
+        while pending:
+            folderId = pending.popleft()
+            if folderId in done or folderId not in self.folders:
+                continue
+            done.add(folderId)
+            path = self.paths.get(folderId)
+            if self.pathIds.get(path) == folderId:
+                del self.pathIds[path]
+            path = self._computePath(folderId)
+            self.paths[folderId] = path
+            self.pathIds.setdefault(path, folderId)
+            pending.extend(self.children.get(folderId, []))
+
+    def _computePath(self, folderId):
+        names = list()
+        visited = set()
+        while folderId is not None and folderId in self.folders and folderId not in visited:
+            visited.add(folderId)
+            names.append(self.folders[folderId].name)
+            folderId = self.parents.get(folderId)
+        return self.sep.join(reversed(names))
+
+    ###########################################
+    # lookups
+    ###########################################
+
+    def getById(self, folderId):
+        """
+        :param int folderId: id of the folder
+        :return: the folder or None
+        :rtype: APIFolder
+        """
+
+        return self._copy(self.folders.get(folderId))
+
+    def getByPath(self, path):
+        """
+        :param str path: full path of the folder, e.g. MyProjects/Study/01_Original
+        :return: the folder or None
+        :rtype: APIFolder
+        """
+
+        folderId = self.pathIds.get(path.strip(self.sep))
+        return self._copy(self.folders.get(folderId)) if folderId is not None else None
+
+    def getByName(self, name):
+        """
+        :param str name: folder name
+        :return: all folders with that name
+        :rtype: list of APIFolder
+        """
+
+        return [self._copy(self.folders[i]) for i in self.nameIds.get(name, [])]
+
+    def getByNamePrefix(self, prefix):
+        """
+        :param str prefix: start of the folder name
+        :return: all folders whose name starts with prefix, ordered by id
+        :rtype: list of APIFolder
+        """
+
+        return [self._copy(f) for _, f in sorted(self.folders.items()) if f.name and f.name.startswith(prefix)]
+
+    def getPath(self, folderId):
+        return self.paths.get(folderId)
+
+    def getParent(self, folderId):
+        return self._copy(self.folders.get(self.parents.get(folderId)))
+
+    def getChildren(self, folderId):
+        """
+        :param int folderId: id of the parent folder
+        :return: the direct subfolders
+        :rtype: list of APIFolder
+        """
+
+        return [self._copy(self.folders[i]) for i in self.children.get(folderId, [])]
+
+    def getChild(self, folderId, name):
+        """
+        :param int folderId: id of the parent folder
+        :param str name: name of the subfolder
+        :return: the subfolder or None
+        :rtype: APIFolder
+        """
+
+        for childId in self.children.get(folderId, []):
+            if self.folders[childId].name == name:
+                return self._copy(self.folders[childId])
+        return None
+
+    def iterSubtreeIds(self, folderId):
+        """
+        :param int folderId: id of the root folder
+        :yields: ids of the folder and of all its subfolders, breadth first
+        """
+
+        pending = collections.deque([folderId])
+        visited = set()
+        while pending:
+            currentId = pending.popleft()
+            if currentId in visited:
+                continue
+            visited.add(currentId)
+            yield currentId
+            pending.extend(self.children.get(currentId, []))
+
+    def iterSubtree(self, folderId):
+        """
+        :param int folderId: id of the root folder
+        :yields: APIFolder, the folder and all its subfolders, breadth first
+        """
+
+        for subId in self.iterSubtreeIds(folderId):
+            if subId in self.folders:
+                yield self._copy(self.folders[subId])
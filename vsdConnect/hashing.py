@@ -0,0 +1,129 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* SHA-1 hashing of local files for connectVSD (dedup checks against fileHashCode)
+* python version: 3
+
+"""
+
+import os
+import mmap
+import hashlib
+import sqlite3
+import threading
+import collections
+import logging
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def sha1File(fp, bufsize=8 * 1024 * 1024):
+    """
+    SHA-1 of a file, in the uppercase hexadecimal form of fileHashCode. The file is memory mapped and hashed in
+    slices of bufsize bytes; hashlib releases the GIL while hashing, so several files can be hashed in parallel
+    threads
+
+    :param Path fp: the file
+    :param int bufsize: bytes hashed per call
+    :return: the hash
+    :rtype: str
+    """
+
+    hasher = hashlib.sha1()
+    with Path(fp).open('rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > 0:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                view = memoryview(mm)
+                for offset in range(0, size, bufsize):
+                    hasher.update(view[offset:offset + bufsize])
+                view.release()
+            finally:
+                mm.close()
+    return hasher.hexdigest().upper()
+
+
+class HashCache(object):
+    """
+    persistent cache of file hashes in a SQLite file, keyed by (path, size, modification time): a file that did not
+    change is never hashed again. Thread safe.
+
+    :param str path: SQLite database file, ':memory:' for a non persistent cache
+    """
+
+    def __init__(self, path='vsdConnect-hashes.sqlite'):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS hashes '
+                             '(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, sha1 TEXT)')
+
+    def get(self, path, size, mtime):
+        with self._lock:
+            row = self._db.execute('SELECT sha1 FROM hashes WHERE path = ? AND size = ? AND mtime = ?',
+                                   (path, size, mtime)).fetchone()
+        return row[0] if row else None
+
+    def put(self, path, size, mtime, sha1):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)', (path, size, mtime, sha1))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class FileHasher(object):
+    """
+    hashes local files, many at a time on a pool of threads, optionally through a HashCache::
+
+        hasher = FileHasher(HashCache('hashes.sqlite'), maxWorkers=8)
+        hashes = hasher.hashFiles(Path('CT').glob('*.dcm'))
+
+    :param HashCache cache: cache of the hashes, None to always hash
+    :param int maxWorkers: number of files hashed at the same time
+    :param int bufsize: bytes hashed per call
+    """
+
+    def __init__(self, cache=None, maxWorkers=4, bufsize=8 * 1024 * 1024):
+        self.cache = cache
+        self.maxWorkers = maxWorkers
+        self.bufsize = bufsize
+
+    def hashFile(self, fp):
+        """
+        :param Path fp: the file
+        :return: SHA-1 of the file (uppercase)
+        :rtype: str
+        """
+
+        fp = Path(fp)
+        if self.cache is None:
+            return sha1File(fp, self.bufsize)
+        stat = fp.stat()
+        key = str(fp.resolve())
+        sha1 = self.cache.get(key, stat.st_size, stat.st_mtime_ns)
+        if sha1 is None:
+            sha1 = sha1File(fp, self.bufsize)
+            self.cache.put(key, stat.st_size, stat.st_mtime_ns, sha1)
+        return sha1
+
+    def hashFiles(self, fps):
+        """
+        :param list fps: the files
+        :return: SHA-1 (uppercase) of every file, in input order
+        :rtype: OrderedDict of Path -> str
+        """
+
+        fps = [Path(fp) for fp in fps]
+        if self.maxWorkers <= 1:
+            return collections.OrderedDict((fp, self.hashFile(fp)) for fp in fps)
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            return collections.OrderedDict(zip(fps, executor.map(self.hashFile, fps)))
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* JSON codecs of the request and response bodies of connectVSD
+* python version: 3
+* orjson or ujson are used if installed (pip install vsdConnect[fastjson]), else the standard library
+
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# codecs tried by getCodec(), fastest first
+PREFERENCE = ('orjson', 'ujson', 'json')
+
+
+class JsonCodec(object):
+    """
+    loads and dumps of a JSON library, working on bytes: loads decodes a response body without decoding it to
+    text first, dumps returns the UTF-8 encoded request body
+
+    :param str name: name of the library
+    :param loads: function bytes -> data
+    :param dumps: function data -> bytes
+    """
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return '<JsonCodec: {0}>'.format(self.name)
+
+
+def _orjson():
+    import orjson
+    return JsonCodec('orjson', orjson.loads, orjson.dumps)
+
+
+def _ujson():
+    import ujson
+
+    def dumps(data):
+        return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+    return JsonCodec('ujson', ujson.loads, dumps)
+
+
+def _json():
+    def dumps(data):
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    return JsonCodec('json', json.loads, dumps)
+
+
+_factories = {
+    'orjson': _orjson,
+    'ujson': _ujson,
+    'json': _json,
+}
+
+
+def getCodec(name=None):
+    """
+    the codec of a JSON library
+
+    :param name: 'orjson', 'ujson' or 'json' (standard library), None for the fastest installed one, or a JsonCodec
+    :return: the codec
+    :rtype: JsonCodec
+    :raises: ImportError if the requested library is not installed, ValueError if it is unknown
+    """
+
+    if isinstance(name, JsonCodec):
+        return name
+    if name is not None:
+        if name not in _factories:
+            raise ValueError('unknown JSON codec {0}, use one of {1}'.format(name, ', '.join(PREFERENCE)))
+        return _factories[name]()
+    for candidate in PREFERENCE:
+        try:
+            codec = _factories[candidate]()
+        except ImportError:
+            continue
+        logger.debug('JSON codec: {0}'.format(codec.name))
+        return codec
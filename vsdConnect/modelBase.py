@@ -0,0 +1,330 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* base class and fields of the connectVSD models (replaces jsonmodels)
+* python version: 3
+
+Models are slotted classes; their fields are declared like jsonmodels fields. Parsing a response only converts
+the embedded models and lists of models, with a decoder table compiled once per class. Types and required fields
+are checked on validate() and to_struct(), i.e. before data is written to the server.
+"""
+
+import collections
+
+try:  # if PYTHON2:
+    stringTypes = (str, unicode)
+    integerTypes = (int, long)
+except NameError:
+    stringTypes = (str,)
+    integerTypes = (int,)
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def _isModel(modelType):
+    return isinstance(modelType, type) and issubclass(modelType, Base)
+
+
+class BaseField(object):
+    """
+    a model field
+
+    :param bool required: validate() fails if the field is not set
+    :param default: value of the field when not set
+    """
+
+    types = ()
+
+    def __init__(self, required=False, default=None):
+        self.required = required
+        self.default = default
+        self.name = None
+
+    def decoder(self):
+        # function converting a json value into the field value, None if the value is kept as it is
+        return None
+
+    def getDefault(self):
+        return self.default
+
+    def validate(self, value):
+        if value is None:
+            if self.required:
+                raise ValidationError('field {0} is required'.format(self.name))
+            return
+        if self.types and not isinstance(value, self.types):
+            raise ValidationError('field {0}: {1!r} is not of type {2}'.format(
+                self.name, value, ', '.join(t.__name__ for t in self.types)))
+
+    def toStruct(self, value):
+        return value
+
+
+class StringField(BaseField):
+    types = stringTypes
+
+
+class IntField(BaseField):
+    types = integerTypes
+
+
+class FloatField(BaseField):
+    types = (float,) + integerTypes
+
+
+class BoolField(BaseField):
+    types = (bool,)
+
+
+class EmbeddedField(BaseField):
+    """
+    a model (or dict) embedded in the json
+
+    :param modelType: model class, its name (for classes defined later) or dict
+    """
+
+    def __init__(self, modelType, required=False, default=None):
+        super(EmbeddedField, self).__init__(required=required, default=default)
+        self._modelType = modelType
+
+    @property
+    def modelType(self):
+        if isinstance(self._modelType, stringTypes):
+            self._modelType = _registry[self._modelType]
+        return self._modelType
+
+    def decoder(self):
+        modelType = self.modelType
+        if not _isModel(modelType):
+            return None
+
+        def decode(value):
+            return modelType(**value) if isinstance(value, dict) else value
+
+        return decode
+
+    def validate(self, value):
+        super(EmbeddedField, self).validate(value)
+        if value is None:
+            return
+        if isinstance(value, Base):
+            if not isinstance(value, self.modelType) and _isModel(self.modelType):
+                raise ValidationError('field {0}: {1!r} is not a {2}'.format(self.name, value,
+                                                                            self.modelType.__name__))
+            value.validate()
+        elif not isinstance(value, dict):
+            raise ValidationError('field {0}: {1!r} is not an embedded object'.format(self.name, value))
+
+    def toStruct(self, value):
+        return value.to_struct() if isinstance(value, Base) else value
+
+
+class ListField(BaseField):
+    """
+    a list of values or models, an empty list when not set
+
+    :param itemTypes: type (model class, its name, dict, str, ...) or list of types of the items
+    """
+
+    def __init__(self, itemTypes=None, required=False, default=None):
+        super(ListField, self).__init__(required=required, default=default)
+        if itemTypes is None:
+            itemTypes = []
+        self._itemTypes = list(itemTypes) if isinstance(itemTypes, (list, tuple)) else [itemTypes]
+
+    @property
+    def itemTypes(self):
+        self._itemTypes = [_registry[t] if isinstance(t, stringTypes) else t for t in self._itemTypes]
+        return self._itemTypes
+
+    def decoder(self):
+        models = [t for t in self.itemTypes if _isModel(t)]
+        if len(models) != 1:
+            return None
+        modelType = models[0]
+
+        def decode(value):
+            return [modelType(**item) if isinstance(item, dict) else item for item in value]
+
+        return decode
+
+    def getDefault(self):
+        return list(self.default) if self.default is not None else []
+
+    def validate(self, value):
+        if value is None:
+            super(ListField, self).validate(value)
+            return
+        if not isinstance(value, (list, tuple)):
+            raise ValidationError('field {0}: {1!r} is not a list'.format(self.name, value))
+        itemTypes = tuple(self.itemTypes)
+        models = [t for t in itemTypes if _isModel(t)]
+        for item in value:
+            if isinstance(item, Base):
+                item.validate()
+            elif itemTypes and not isinstance(item, itemTypes) and not (models and isinstance(item, dict)):
+                raise ValidationError('field {0}: item {1!r} is not of type {2}'.format(
+                    self.name, item, ', '.join(t.__name__ for t in itemTypes)))
+
+    def toStruct(self, value):
+        return [item.to_struct() if isinstance(item, Base) else item for item in value]
+
+
+_registry = dict()  # model name -> class, for fields referring to classes by name
+
+
+class ModelMeta(type):
+    """
+    collects the fields of a model class (own and inherited) and declares a slot for every new field
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        fields = collections.OrderedDict()
+        for base in reversed(bases):
+            fields.update(getattr(base, '_fields', {}))
+        own = [(key, value) for key, value in list(namespace.items()) if isinstance(value, BaseField)]
+        slots = list()
+        for key, field in own:
+            del namespace[key]
+            field.name = key
+            if key not in fields:
+                slots.append(key)
+            fields[key] = field
+        namespace.setdefault('__slots__', tuple(slots))
+        namespace['_fields'] = fields
+        namespace['_decoders'] = None
+        cls = type.__new__(mcs, name, bases, namespace)
+        _registry[name] = cls
+        return cls
+
+
+# python 2 and 3 compatible way to set the metaclass
+_ModelBase = ModelMeta('_ModelBase', (object,), {'__slots__': ()})
+
+
+class Base(_ModelBase):
+    """
+    base class of the models::
+
+        class APIFolder(APIBasic):
+            id = IntField()
+            name = StringField()
+            childFolders = ListField(APIBasic)
+
+        folder = APIFolder(**response)  # unknown keys are ignored
+        folder.name = 'new name'
+        data = folder.to_struct()  # validates
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        decoders = self._decoders
+        if decoders is None:
+            decoders = self._compile()
+        for name, value in kwargs.items():
+            if name in decoders:
+                decode = decoders[name]
+                if decode is not None and value is not None:
+                    value = decode(value)
+                setattr(self, name, value)
+
+    @classmethod
+    def _compile(cls):
+        # field name -> decoder of the json value (None: kept as it is)
+        cls._decoders = dict((name, field.decoder()) for name, field in cls._fields.items())
+        return cls._decoders
+
+    def __getattr__(self, name):
+        # only called for fields that were never set
+        field = type(self)._fields.get(name)
+        if field is None:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, name))
+        value = field.getDefault()
+        if value is not None:
+            # keep mutable defaults (lists) so that changes to them are not lost
+            setattr(self, name, value)
+        return value
+
+    def _setValues(self):
+        # (name, field, value) of the fields set on the instance
+        for name, field in self._fields.items():
+            try:
+                value = object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+            yield name, field, value
+
+    def isSet(self, name):
+        """
+        :param str name: field name
+        :return: True if the field was set, reading an unset field returns its default instead
+        :rtype: bool
+        """
+
+        return any(setName == name for setName, _, _ in self._setValues())
+
+    def __iter__(self):
+        return iter(self._fields.items())
+
+    def populate(self, **kwargs):
+        """
+        set the fields from json data, unknown keys are ignored
+        """
+
+        Base.__init__(self, **kwargs)
+
+    def set(self, obj=None, **kwargs):
+        """
+        set the fields from a dict or from another model (older models API)
+        """
+
+        if isinstance(obj, Base):
+            obj = dict((name, value) for name, _, value in obj._setValues())
+        data = dict(obj or {})
+        data.update(kwargs)
+        self.populate(**data)
+
+    def validate(self):
+        """
+        check the types of the fields and the required fields
+
+        :raises: ValidationError
+        """
+
+        for name, field in self._fields.items():
+            try:
+                value = object.__getattribute__(self, name)
+            except AttributeError:
+                value = None
+            field.validate(value)
+
+    def to_struct(self):
+        """
+        :return: the json data of the model, fields set to None are left out
+        :rtype: dict
+        :raises: ValidationError
+        """
+
+        self.validate()
+        return dict((name, field.toStruct(value)) for name, field, value in self._setValues() if value is not None)
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return False
+        mine = dict((name, value) for name, _, value in self._setValues() if value is not None)
+        theirs = dict((name, value) for name, _, value in other._setValues() if value is not None)
+        return mine == theirs
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<{0}: {1}>'.format(type(self).__name__, ', '.join(
+            '{0}={1!r}'.format(name, value) for name, _, value in self._setValues() if value is not None))
@@ -1,32 +1,32 @@
-from jsonmodels import models, fields, errors, validators
+from modelBase import Base, StringField, IntField, EmbeddedField, ListField, ValidationError
 
 
 
 ################################################
 #JWT token
 ################################################
-class  APIToken(models.Base):
-    tokenType = fields.StringField()
-    tokenValue = fields.StringField()
+class  APIToken(Base):
+    tokenType = StringField()
+    tokenValue = StringField()
 
 ################################################
 #Models
 ################################################
 
-class fieldURL(fields.StringField):
+class fieldURL(StringField):
     pass #add url-specific fields?
 
-class ParamsPagination(models.Base):
-    rpp = fields.IntField()
-    page = fields.IntField()
+class ParamsPagination(Base):
+    rpp = IntField()
+    page = IntField()
 
-class APIBasic(models.Base):
+class APIBasic(Base):
     selfUrl = fieldURL()
 
-class APIPagination(models.Base):
-    totalCount = fields.IntField(required=True)
-    pagination = fields.EmbeddedField(ParamsPagination, required=True)
-    items = fields.ListField(dict) #generic dict in order to retain all the keys
+class APIPagination(Base):
+    totalCount = IntField(required=True)
+    pagination = EmbeddedField(ParamsPagination, required=True)
+    items = ListField(dict) #generic dict in order to retain all the keys
     nextPageUrl = fieldURL()
 
     def firstUrlInPage(self):
@@ -34,102 +34,118 @@ class APIPagination(models.Base):
         return firstItem.selfUrl
 
 class APIFileUploadResponse(APIBasic):
-    relatedObject = fields.EmbeddedField(APIBasic)
-    file = fields.EmbeddedField(APIBasic)
+    relatedObject = EmbeddedField(APIBasic)
+    file = EmbeddedField(APIBasic)
 
 
 class APIFile(APIBasic):
-    id = fields.IntField()
-    createdDate = fields.StringField()
+    id = IntField()
+    createdDate = StringField()
     downloadUrl = fieldURL()
-    originalFileName = fields.StringField()
-    anonymizedFileHashCode = fields.StringField()
-    size = fields.IntField()
-    fileHashCode = fields.StringField()
-    objects = fields.EmbeddedField(APIPagination) #ObjectPagination
+    originalFileName = StringField()
+    anonymizedFileHashCode = StringField()
+    size = IntField()
+    fileHashCode = StringField()
+    objects = EmbeddedField(APIPagination) #ObjectPagination
 
 class FilePagination(APIPagination):
-    items = fields.ListField(APIFile)
+    items = ListField(APIFile)
 
 class APIPreview(APIBasic):
     imageUrl = fieldURL()
     thumbnailUrl = fieldURL()
-    id = fields.IntField()
+    id = IntField()
 
 class APIObjectType(APIBasic):
-    displayName = fields.StringField()
-    name = fields.StringField()
-    displayNameShort = fields.StringField()
+    displayName = StringField()
+    name = StringField()
+    displayNameShort = StringField()
 
 
 class APIObjectUserRight(APIBasic):
-    pass
+    relatedObject = EmbeddedField(dict)
+    relatedRights = ListField(dict)
+    relatedUser = EmbeddedField(dict)
 
 class APIObjectGroupRight(APIBasic):
-    pass
+    relatedObject = EmbeddedField(dict)
+    relatedRights = ListField(dict)
+    relatedGroup = EmbeddedField(dict)
 
 class APILicense(APIBasic):
-    pass
+    id = IntField()
+    name = StringField()
+    description = StringField()
 
 class APIObjectRight(APIBasic):
-    pass
+    id = IntField()
+    name = StringField()
+    rightValue = IntField()
 
 class APIGroup(APIBasic):
-    pass
+    id = IntField()
+    name = StringField()
 
 class APIUser(APIBasic):
     pass
 
 class APIObject(APIBasic):
-    id = fields.IntField()
-    name = fields.StringField()
-    type = fields.EmbeddedField(APIObjectType)
-    description  = fields.StringField()
-    objectGroupRights = fields.ListField(APIObjectGroupRight)
-    objectUserRights = fields.ListField(APIObjectUserRight)
-    objectPreviews = fields.ListField(APIPreview)
-    createdDate = fields.StringField()
-    modality = fields.StringField()
-    ontologyItems = fields.EmbeddedField(APIPagination)
-    ontologyItemRelations = fields.EmbeddedField(APIPagination)
-    ontologyCount = fields.IntField()
-    license = fields.EmbeddedField(APILicense)
-    files = fields.EmbeddedField(APIPagination)
-    linkedObjects = fields.EmbeddedField('ObjectPagination')
-    linkedObjectRelations = fields.EmbeddedField(APIPagination)
+    id = IntField()
+    name = StringField()
+    type = EmbeddedField(APIObjectType)
+    description  = StringField()
+    objectGroupRights = ListField(APIObjectGroupRight)
+    objectUserRights = ListField(APIObjectUserRight)
+    objectPreviews = ListField(APIPreview)
+    createdDate = StringField()
+    modality = StringField()
+    ontologyItems = EmbeddedField(APIPagination)
+    ontologyItemRelations = EmbeddedField(APIPagination)
+    ontologyCount = IntField()
+    license = EmbeddedField(APILicense)
+    files = EmbeddedField(APIPagination)
+    linkedObjects = EmbeddedField('ObjectPagination')
+    linkedObjectRelations = EmbeddedField(APIPagination)
     downloadUrl = fieldURL()
 
 class ObjectPagination(APIPagination):
-    items = fields.ListField(APIObject)
+    items = ListField(APIObject)
 
 class APIObjectLink(APIBasic):
-    id = fields.IntField()
-    description = fields.StringField()
-    object1 = fields.StringField()
-    object2 = fields.StringField()
+    id = IntField()
+    description = StringField()
+    object1 = StringField()
+    object2 = StringField()
 
 class APIFolder(APIBasic):
-    id = fields.IntField()
-    name = fields.StringField()
-    level = fields.IntField()
-    parentFolder = fields.EmbeddedField(APIBasic)
-    childFolders = fields.ListField(APIBasic)#fields.ListField([ 'APIFolder'])
-    folderGroupRights = fields.ListField(APIBasic)
-    folderUserRights = fields.ListField(APIBasic)
-    containedObjects = fields.ListField(APIBasic)
+    id = IntField()
+    name = StringField()
+    level = IntField()
+    parentFolder = EmbeddedField(APIBasic)
+    childFolders = ListField(APIBasic)#ListField([ 'APIFolder'])
+    folderGroupRights = ListField(APIBasic)
+    folderUserRights = ListField(APIBasic)
+    containedObjects = ListField(APIBasic)
 
 class FolderPagination(APIPagination):
-    items = fields.ListField(APIFolder)
+    items = ListField(APIFolder)
 
 
 class APIObjectOntology(APIBasic):
-    pass
+    position = IntField()
+    type = IntField()
+    object = EmbeddedField(dict)
+    ontologyItem = EmbeddedField(dict)
 
 class APIModality(APIBasic):
-    pass
+    id = IntField()
+    name = StringField()
+    description = StringField()
 
 class APIOntology(APIBasic):
-    pass
+    id = IntField()
+    term = StringField()
+    type = IntField()
 
 ###############################
 # API url dictionary
@@ -141,29 +157,81 @@ resourceTypes = {
     'object-links' : APIObjectLink
 }
 
+# type name of the object json ('RawImage') -> model class, filled by registerObjectType
+objectTypes = dict()
+
+
+def registerResourceType(resourceType, model):
+    """
+    register the model of a resource, used for the selfUrls <api>/<resourceType>/<id>
+
+    :param str resourceType: resource part of the url, e.g. 'object-links'
+    :param model: model class
+    """
+
+    resourceTypes[resourceType] = model
+
+
+def registerObjectType(model=None, name=None):
+    """
+    register the model of an object type, createAPIObject instantiates it for the objects of that type.
+    Can be used as class decorator, plugins register their own types the same way::
+
+        @registerObjectType
+        class RawImage(APIObject):
+            ...
+
+        registerObjectType(MyType, name='MyObjectType')
+
+    :param model: model class, subclass of APIObject
+    :param str name: type name in the json, default the class name
+    """
+
+    def register(model):
+        objectTypes[name or model.__name__] = model
+        return model
+
+    return register if model is None else register(model)
+
+
+def objectModel(typeName):
+    """
+    :param str typeName: type name in the object json
+    :return: the registered model of the type, None if unknown
+    """
+
+    return objectTypes.get(typeName)
+
 
 ##########################################
 # Object types
 ##########################################
+@registerObjectType
 class RawImage(APIObject):
-    rawImage = fields.EmbeddedField(dict) #{u'sliceThickness': None, u'kilovoltPeak': None, u'spaceBetweenSlices': None, u'modality': {u'description': u'White Matter Probabilistic Map', u'id': 39, u'selfUrl': u'https://demo.virtualskeleton.ch/api/modalities/39', u'name': u'MR_WM_prob'}}
+    rawImage = EmbeddedField(dict) #{u'sliceThickness': None, u'kilovoltPeak': None, u'spaceBetweenSlices': None, u'modality': {u'description': u'White Matter Probabilistic Map', u'id': 39, u'selfUrl': u'https://demo.virtualskeleton.ch/api/modalities/39', u'name': u'MR_WM_prob'}}
 
 
+@registerObjectType
 class SurfaceModel(APIObject):
     pass
 
+@registerObjectType
 class Subject(APIObject):
     pass
 
+@registerObjectType
 class SegmentationImage(APIObject):
     pass
 
+@registerObjectType
 class ClinicalStudyDefinition(APIObject):
     pass
 
+@registerObjectType
 class ClinicalStudyData(APIObject):
     pass
 
+@registerObjectType
 class StatisticalModel(APIObject):
     pass
 
@@ -0,0 +1,328 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* columnar table of object listings for connectVSD (analytics over many objects)
+* python version: 3
+* requires numpy (pip install vsdConnect[table]), pyarrow for the Parquet export (vsdConnect[parquet])
+
+"""
+
+import csv
+import re
+import collections
+import logging
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# columns of the table, the string columns hold codes into the StringPool
+COLUMNS = ('id', 'type', 'name', 'selfUrl', 'createdDate', 'ontologyCount')
+STRING_COLUMNS = ('type', 'name', 'selfUrl')
+
+
+class StringPool(object):
+    """
+    interned strings: every distinct string is stored once and referred to by its code, None has the code -1
+    """
+
+    def __init__(self):
+        self.strings = list()
+        self._codes = dict()
+
+    def code(self, value):
+        """
+        :param str value: string to intern
+        :return: the code of the string, added to the pool if new
+        :rtype: int
+        """
+
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def lookup(self, value):
+        """
+        :return: the code of a string, None if it is not in the pool
+        """
+
+        return self._codes.get(value)
+
+    def decode(self, codes):
+        """
+        :param numpy.ndarray codes: string codes
+        :return: the strings (None for -1)
+        :rtype: numpy.ndarray of object
+        """
+
+        return numpy.array(self.strings + [None], dtype=object)[codes]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def _requireNumpy():
+    if numpy is None:
+        raise ImportError('ObjectTable requires numpy (pip install vsdConnect[table])')
+
+
+def _objectId(item):
+    oid = item.get('id')
+    if oid is None and item.get('selfUrl'):
+        try:
+            oid = int(item['selfUrl'].rstrip('/').rsplit('/', 1)[-1])
+        except ValueError:
+            pass
+    return -1 if oid is None else oid
+
+
+class ObjectTable(object):
+    """
+    compact columnar table of objects: the columns are numpy arrays (id, type, createdDate, ontologyCount) and
+    codes into a shared StringPool (type, name, selfUrl), a few dozen bytes per object. Built directly from the
+    json items of a listing, no model objects are created. Filters are boolean masks over the columns::
+
+        table = api.getObjectTable('objects/published')
+        images = table.select(table.isType('RawImage', 'SegmentationImage') & (table.ontologyCount > 0))
+        images.countBy('type')
+        images.toCsv(Path('images.csv'))
+
+    :attributes:
+        * id: object ids (int64, -1 if unknown)
+        * typeCode, nameCode, selfUrlCode: string codes (int32) into pool
+        * createdDate: creation dates (datetime64[s], NaT if unknown)
+        * ontologyCount: number of ontology items (int32)
+        * pool: the StringPool of the string columns
+    """
+
+    def __init__(self, pool, id, typeCode, nameCode, selfUrlCode, createdDate, ontologyCount):
+        _requireNumpy()
+        self.pool = pool
+        self.id = id
+        self.typeCode = typeCode
+        self.nameCode = nameCode
+        self.selfUrlCode = selfUrlCode
+        self.createdDate = createdDate
+        self.ontologyCount = ontologyCount
+
+    @classmethod
+    def fromItems(cls, items, chunkSize=10000):
+        """
+        build the table from json items of objects, consumed as a stream (e.g. iterateAllPaginated(resource))
+
+        :param items: iterable of dict, the object json
+        :param int chunkSize: number of dates converted at once
+        :return: the table
+        :rtype: ObjectTable
+        """
+
+        _requireNumpy()
+        pool = StringPool()
+        ids = array('q')
+        typeCodes, nameCodes, urlCodes, counts = array('i'), array('i'), array('i'), array('i')
+        dates = list()
+        pending = list()
+        for item in items:
+            ids.append(_objectId(item))
+            typeCodes.append(pool.code((item.get('type') or {}).get('name')))
+            nameCodes.append(pool.code(item.get('name')))
+            urlCodes.append(pool.code(item.get('selfUrl')))
+            counts.append(item.get('ontologyCount') or 0)
+            created = item.get('createdDate')
+            pending.append(created[:19] if created else 'NaT')  # seconds, without the time zone
+            if len(pending) >= chunkSize:
+                dates.append(numpy.array(pending, dtype='datetime64[s]'))
+                pending = list()
+        dates.append(numpy.array(pending, dtype='datetime64[s]'))
+
+        table = cls(pool,
+                    numpy.frombuffer(ids, dtype=numpy.int64).copy(),
+                    numpy.frombuffer(typeCodes, dtype=numpy.int32).copy(),
+                    numpy.frombuffer(nameCodes, dtype=numpy.int32).copy(),
+                    numpy.frombuffer(urlCodes, dtype=numpy.int32).copy(),
+                    numpy.concatenate(dates),
+                    numpy.frombuffer(counts, dtype=numpy.int32).copy())
+        logger.debug('object table: {0} objects, {1} distinct strings'.format(len(table), len(pool)))
+        return table
+
+    def __len__(self):
+        return len(self.id)
+
+    def _codes(self, column):
+        if column not in STRING_COLUMNS:
+            raise KeyError('{0} is not a string column'.format(column))
+        return getattr(self, column + 'Code')
+
+    def column(self, column):
+        """
+        :param str column: one of COLUMNS
+        :return: the values of the column, strings decoded
+        :rtype: numpy.ndarray
+        """
+
+        if column in STRING_COLUMNS:
+            return self.pool.decode(self._codes(column))
+        if column not in COLUMNS:
+            raise KeyError('unknown column {0}'.format(column))
+        return getattr(self, column)
+
+    def select(self, mask):
+        """
+        :param numpy.ndarray mask: boolean mask or indices of the rows
+        :return: the selected rows, sharing the string pool
+        :rtype: ObjectTable
+        """
+
+        return ObjectTable(self.pool, self.id[mask], self.typeCode[mask], self.nameCode[mask],
+                           self.selfUrlCode[mask], self.createdDate[mask], self.ontologyCount[mask])
+
+    def _matching(self, column, strings):
+        codes = [self.pool.lookup(s) for s in strings]
+        return numpy.isin(self._codes(column), [c for c in codes if c is not None])
+
+    def isType(self, *typeNames):
+        """
+        :param str typeNames: object type names, e.g. 'RawImage'
+        :return: mask of the objects of these types
+        :rtype: numpy.ndarray of bool
+        """
+
+        return self._matching('type', typeNames)
+
+    def matches(self, column, pattern):
+        """
+        regular expression search in a string column. Every distinct string is tested once
+
+        :param str column: 'type', 'name' or 'selfUrl'
+        :param str pattern: regular expression
+        :return: mask of the matching rows
+        :rtype: numpy.ndarray of bool
+        """
+
+        regex = re.compile(pattern)
+        hits = numpy.array([regex.search(s) is not None for s in self.pool.strings] + [False], dtype=bool)
+        return hits[self._codes(column)]
+
+    def createdBetween(self, start=None, end=None):
+        """
+        :param start: first date (datetime, numpy.datetime64 or ISO string), None for no lower bound
+        :param end: date excluded, None for no upper bound
+        :return: mask of the objects created in [start, end)
+        :rtype: numpy.ndarray of bool
+        """
+
+        mask = ~numpy.isnat(self.createdDate)
+        if start is not None:
+            mask &= self.createdDate >= numpy.datetime64(start, 's')
+        if end is not None:
+            mask &= self.createdDate < numpy.datetime64(end, 's')
+        return mask
+
+    def _groups(self, column):
+        # distinct keys and the inverse index of every row
+        if column in STRING_COLUMNS:
+            codes, inverse = numpy.unique(self._codes(column), return_inverse=True)
+            return self.pool.decode(codes), inverse
+        if column == 'createdDate':
+            raise KeyError('group by the day with table.createdDate.astype("datetime64[D]") instead')
+        return numpy.unique(self.column(column), return_inverse=True)
+
+    def countBy(self, column):
+        """
+        :param str column: column to group by
+        :return: number of rows per value
+        :rtype: OrderedDict
+        """
+
+        keys, inverse = self._groups(column)
+        counts = numpy.bincount(inverse.ravel(), minlength=len(keys))
+        return collections.OrderedDict(zip(keys.tolist(), counts.tolist()))
+
+    def groupBy(self, column):
+        """
+        :param str column: column to group by
+        :return: the rows per value
+        :rtype: OrderedDict of ObjectTable
+        """
+
+        keys, inverse = self._groups(column)
+        inverse = inverse.ravel()
+        order = numpy.argsort(inverse, kind='stable')
+        bounds = numpy.searchsorted(inverse[order], numpy.arange(len(keys) + 1))
+        return collections.OrderedDict((key, self.select(order[bounds[i]:bounds[i + 1]]))
+                                       for i, key in enumerate(keys.tolist()))
+
+    def toCsv(self, fp, chunkSize=10000):
+        """
+        write the table as CSV, chunkSize rows are decoded at once
+
+        :param Path fp: the target file
+        """
+
+        with open(str(fp), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for start in range(0, len(self), chunkSize):
+                part = self.select(slice(start, start + chunkSize))
+                dates = numpy.datetime_as_string(part.createdDate, unit='s')
+                dates[numpy.isnat(part.createdDate)] = ''
+                writer.writerows(zip(part.id.tolist(), part.column('type'), part.column('name'),
+                                     part.column('selfUrl'), dates.tolist(), part.ontologyCount.tolist()))
+
+    def toArrow(self):
+        """
+        :return: the table as Arrow table, string columns dictionary encoded
+        :rtype: pyarrow.Table
+        """
+
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('the Arrow / Parquet export requires pyarrow (pip install vsdConnect[parquet])')
+
+        def dictionaryColumn(codes):
+            used, indices = numpy.unique(codes, return_inverse=True)
+            indices = indices.ravel().astype(numpy.int32)
+            if len(used) and used[0] == -1:
+                # None: null entries, not part of the dictionary
+                used = used[1:]
+                nulls = indices == 0
+                indices = indices - 1
+                indices[nulls] = 0
+            else:
+                nulls = None
+            dictionary = pyarrow.array(self.pool.decode(used).tolist(), type=pyarrow.string())
+            return pyarrow.DictionaryArray.from_arrays(pyarrow.array(indices, mask=nulls), dictionary)
+
+        return pyarrow.table([
+            pyarrow.array(self.id),
+            dictionaryColumn(self.typeCode),
+            dictionaryColumn(self.nameCode),
+            dictionaryColumn(self.selfUrlCode),
+            pyarrow.array(self.createdDate, mask=numpy.isnat(self.createdDate)),
+            pyarrow.array(self.ontologyCount),
+        ], names=list(COLUMNS))
+
+    def toParquet(self, fp):
+        """
+        write the table as Parquet file
+
+        :param Path fp: the target file
+        """
+
+        table = self.toArrow()
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, str(fp))
+
+    def __repr__(self):
+        return '<ObjectTable: {0} objects, {1} types>'.format(len(self), len(numpy.unique(self.typeCode)))
@@ -0,0 +1,165 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* parallel upload of file series (e.g. DICOM slices) for connectVSD
+* python version: 3
+
+"""
+
+import time
+import heapq
+import collections
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from pathlib import Path
+
+import requests
+
+import transfer as vsdTransfer
+
+logger = logging.getLogger(__name__)
+
+
+class SeriesUploadResult(object):
+    """
+    outcome of a series upload
+
+    :attributes:
+        * uploadedObjects: OrderedDict object selfUrl -> list of (file selfUrl, local path)
+        * failedFiles: list of (local path, exception)
+        * skippedFiles: list of local paths already on the server
+        * attempts: dict local path -> number of upload attempts
+        * report: UploadReport, uploaded and skipped bytes
+    """
+
+    def __init__(self):
+        self.uploadedObjects = collections.OrderedDict()
+        self.failedFiles = list()
+        self.skippedFiles = list()
+        self.attempts = dict()
+        self.report = vsdTransfer.UploadReport()
+
+    @property
+    def uploadedFiles(self):
+        return sum(len(files) for files in self.uploadedObjects.values())
+
+    def __repr__(self):
+        return '<SeriesUploadResult: {0} files in {1} objects, {2} skipped, {3} failed>'.format(
+            self.uploadedFiles, len(self.uploadedObjects), len(self.skippedFiles), len(self.failedFiles))
+
+
+class SeriesUploader(object):
+    """
+    uploads many files (e.g. the slices of a DICOM series) on a pool of threads. Failed uploads go to a retry
+    queue and are attempted again after an exponential backoff; authorization errors (401, 403) are not retried.
+    The object of every file is taken from the upload response, without further requests::
+
+        uploader = SeriesUploader(api, maxWorkers=8)
+        result = uploader.upload(sorted(Path('CT').glob('*.dcm')))
+        for objUrl, files in result.uploadedObjects.items():
+            ...
+
+    :param VSDConnecter connector: connector used for the uploads
+    :param int maxWorkers: number of files uploaded at the same time
+    :param int maxAttempts: upload attempts per file
+    :param float backoff: seconds to wait before the first retry, doubled at every further attempt
+    :param float maxBackoff: maximum wait between attempts
+    """
+
+    def __init__(self, connector, maxWorkers=4, maxAttempts=3, backoff=1., maxBackoff=30.):
+        self.connector = connector
+        self.maxWorkers = maxWorkers
+        self.maxAttempts = maxAttempts
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+
+    def _retriable(self, error):
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code not in (401, 403)
+        return not isinstance(error, (IOError, OSError)) or isinstance(error, requests.exceptions.RequestException)
+
+    def _uploadOne(self, fp):
+        # a single attempt: retries and backoff are handled by upload()
+        res = self.connector._upload(fp, maxAttempts=1)
+        objUrl, _ = self.connector.fileObjectVersion(res)
+        return objUrl, res['file']['selfUrl']
+
+    def upload(self, filenames, skipIn=None):
+        """
+        upload the files
+
+        :param list filenames: paths of the files to upload
+        :param skipIn: APIObject, APIFolder or set of file hashes: files already there are skipped. The remote
+            hashes are retrieved once and the local files are hashed in parallel
+        :return: the uploaded objects, the skipped and the failed files
+        :rtype: SeriesUploadResult
+        """
+
+        filenames = [Path(f) for f in filenames]
+        result = SeriesUploadResult()
+        hashes = self.connector.skipHashes(skipIn)
+        if hashes is not None:
+            todo = list()
+            for fp, h in self.connector.hasher.hashFiles(filenames).items():
+                if h in hashes:
+                    result.skippedFiles.append(fp)
+                    result.report.skipped(fp, fp.stat().st_size)
+                else:
+                    todo.append(fp)
+            logger.info('%d of %d files already on the server, skipped' % (len(result.skippedFiles), len(filenames)))
+            filenames = todo
+        nfiles = len(filenames)
+        uploaded = dict()  # index -> (object selfUrl, file selfUrl)
+        todo = collections.deque(range(nfiles))
+        retries = list()  # heap of (due time, index)
+        running = dict()  # future -> index
+        executor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+        try:
+            while todo or retries or running:
+                now = time.time()
+                while retries and retries[0][0] <= now:
+                    todo.append(heapq.heappop(retries)[1])
+                while todo and len(running) < self.maxWorkers:
+                    index = todo.popleft()
+                    fp = filenames[index]
+                    result.attempts[fp] = result.attempts.get(fp, 0) + 1
+                    running[executor.submit(self._uploadOne, fp)] = index
+
+                timeout = max(0., retries[0][0] - time.time()) if retries else None
+                if not running:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    fp = filenames[index]
+                    try:
+                        uploaded[index] = future.result()
+                        result.report.uploaded(fp, fp.stat().st_size)
+                    except Exception as e:
+                        attempts = result.attempts[fp]
+                        if attempts < self.maxAttempts and self._retriable(e):
+                            delay = min(self.maxBackoff, self.backoff * 2 ** (attempts - 1))
+                            logger.info('upload of %s failed (%s), retry %d/%d in %.1f s'
+                                        % (fp, e, attempts, self.maxAttempts - 1, delay))
+                            heapq.heappush(retries, (time.time() + delay, index))
+                        else:
+                            logger.error('upload of %s not successful: %s' % (fp, e))
+                            result.failedFiles.append((fp, e))
+                        continue
+                    if len(uploaded) % 10 == 0:
+                        logger.info('%2.0f%% uploaded (%d / %d files)' % (100. * len(uploaded) / nfiles,
+                                                                          len(uploaded), nfiles))
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        # objects listed in the order of their first file
+        for index in sorted(uploaded):
+            objUrl, fileUrl = uploaded[index]
+            result.uploadedObjects.setdefault(objUrl, []).append((fileUrl, filenames[index]))
+        return result
@@ -0,0 +1,620 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* file transfer helpers for connectVSD (streaming uploads, resumable and pipelined chunked uploads, upload reports,
+  resumable ranged downloads)
+* python version: 3
+
+"""
+
+import os
+import json
+import mmap
+import time
+import uuid
+import logging
+import threading
+
+try:  # if PYTHON3:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadVerificationError(IOError):
+    """
+    the SHA-1 of a downloaded file matches none of the hashes known by the server
+    """
+
+    def __init__(self, url, digest, expected):
+        IOError.__init__(self, 'SHA-1 {0} of {1} does not match {2}'.format(digest, url, ', '.join(sorted(expected))))
+        self.url = url
+        self.digest = digest
+        self.expected = expected
+
+
+class MultipartFileStream(object):
+    """
+    multipart/form-data body with a single file field, streamed from disk. The file is read in buffers of
+    bufsize bytes while the request is sent, so the memory used does not depend on the file size.
+    The length is known in advance (Content-Length is set by requests) and the body can be iterated again
+    when a request is retried::
+
+        body = MultipartFileStream(fp)
+        session.post(url, data=body, headers={'Content-Type': body.contentType})
+
+    :param Path fp: the file to send
+    :param str filename: file name sent to the server, default the name of fp
+    :param str fieldname: name of the form field
+    :param int bufsize: read buffer size in bytes
+    """
+
+    def __init__(self, fp, filename=None, fieldname='file', bufsize=1024 * 1024):
+        self.fp = Path(fp)
+        self.size = self.fp.stat().st_size
+        if filename is None:
+            filename = self.fp.name
+        self._form(filename, fieldname, bufsize)
+
+    def _form(self, filename, fieldname, bufsize):
+        # boundary, head and tail of the form around the self.size bytes of the file
+        self.bufsize = bufsize
+        self.boundary = uuid.uuid4().hex
+        self.contentType = 'multipart/form-data; boundary={0}'.format(self.boundary)
+        filename = str(filename).replace('\\', '\\\\').replace('"', '\\"')
+        self.head = ('--{0}\r\n'
+                     'Content-Disposition: form-data; name="{1}"; filename="{2}"\r\n'
+                     'Content-Type: application/octet-stream\r\n\r\n').format(self.boundary, fieldname,
+                                                                              filename).encode('utf-8')
+        self.tail = '\r\n--{0}--\r\n'.format(self.boundary).encode('utf-8')
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        with self.fp.open('rb') as f:
+            while True:
+                buf = f.read(self.bufsize)
+                if not buf:
+                    break
+                yield buf
+        yield self.tail
+
+
+class MultipartBufferStream(MultipartFileStream):
+    """
+    multipart/form-data body with a single file field holding a buffer, e.g. a chunk of ChunkReader. The buffer
+    is sent in memoryview slices of bufsize bytes, it is not copied into the body. As for MultipartFileStream the
+    length is known in advance and the body can be iterated again when a request is retried::
+
+        body = MultipartBufferStream(view, 'big.mha')
+        session.post(url, data=body, headers={'Content-Type': body.contentType})
+
+    :param data: memoryview or bytes-like object to send
+    :param str filename: file name sent to the server
+    :param str fieldname: name of the form field
+    :param int bufsize: size in bytes of the slices sent at once
+    """
+
+    def __init__(self, data, filename, fieldname='file', bufsize=1024 * 1024):
+        self.data = data if isinstance(data, memoryview) else memoryview(data)
+        self.size = self.data.nbytes
+        self._form(filename, fieldname, bufsize)
+
+    def __iter__(self):
+        yield self.head
+        for start in range(0, self.size, self.bufsize):
+            yield self.data[start:start + self.bufsize]
+        yield self.tail
+
+
+class UploadManifest(object):
+    """
+    on-disk state of a chunked upload: identity of the file (path, size, modification time), chunk size and
+    the chunks acknowledged by the server. Saved after every acknowledged chunk, so that an interrupted upload
+    can continue from the first missing chunk::
+
+        manifest = UploadManifest.open('big.mha.upload.json', fp, chunksize)
+        for part, offset, length in manifest.pendingChunks():
+            ...
+            manifest.acknowledge(part, offset, length)
+
+    :param Path path: manifest file (json), None to keep the state in memory only
+    :param Path fp: the uploaded file
+    :param int chunksize: size in bytes of the chunk parts
+    """
+
+    def __init__(self, path, fp, chunksize):
+        self.path = Path(path) if path else None
+        self.fp = Path(fp)
+        stat = self.fp.stat()
+        self.identity = dict(path=str(self.fp.resolve()), size=stat.st_size, mtime=stat.st_mtime)
+        self.size = stat.st_size
+        self.chunksize = chunksize
+        self.chunks = dict()  # part number -> (offset, length)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, fp, chunksize):
+        """
+        load the manifest if it exists and describes the same file, otherwise start a new one.
+        A resumed upload keeps the chunk size it was started with
+
+        :return: the manifest
+        :rtype: UploadManifest
+        """
+
+        manifest = cls(path, fp, chunksize)
+        if manifest.path is None or not manifest.path.is_file():
+            return manifest
+        try:
+            with manifest.path.open('r') as f:
+                state = json.load(f)
+        except ValueError:
+            logger.warning('unreadable upload manifest %s, starting again' % manifest.path)
+            return manifest
+        if state.get('identity') != manifest.identity:
+            logger.info('upload manifest %s is for another version of the file, starting again' % manifest.path)
+            return manifest
+        manifest.chunksize = state['chunksize']
+        manifest.chunks = dict((int(part), tuple(chunk)) for part, chunk in state['chunks'].items())
+        logger.info('resuming upload of %s: %d chunks already acknowledged' % (fp, len(manifest.chunks)))
+        return manifest
+
+    @property
+    def acknowledgedBytes(self):
+        return sum(length for _, length in self.chunks.values())
+
+    def acknowledge(self, part, offset, length):
+        """
+        record a chunk accepted by the server and save the manifest
+        """
+
+        with self._lock:
+            self.chunks[part] = (offset, length)
+            self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        state = dict(identity=self.identity, chunksize=self.chunksize,
+                     chunks=dict((str(part), list(chunk)) for part, chunk in self.chunks.items()))
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w') as f:
+            json.dump(state, f)
+        os.replace(str(tmp), str(self.path))
+
+    def delete(self):
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+    def pendingChunks(self, chunksize=None):
+        """
+        the chunks still to upload. Holes between acknowledged chunks (left by parallel uploads) are sent again
+        with their original part numbers, the rest of the file is split in chunks of chunksize
+
+        :param chunksize: size of the chunks after the last acknowledged one, default self.chunksize.
+            Can be a function returning the size of the next chunk (e.g. AdaptiveChunkSizer.nextSize)
+        :yields: (part, offset, length)
+        """
+
+        if chunksize is None:
+            chunksize = self.chunksize
+        nextSize = chunksize if callable(chunksize) else lambda: chunksize
+        part, offset = 1, 0
+        for acked in sorted(self.chunks):
+            ackedOffset, ackedLength = self.chunks[acked]
+            missing = acked - part
+            if missing > 0:
+                # hole: split the byte range evenly among the missing part numbers
+                holeSize = ackedOffset - offset
+                for i in range(missing):
+                    length = holeSize // missing + (1 if i < holeSize % missing else 0)
+                    yield part + i, offset, length
+                    offset += length
+            part, offset = acked + 1, ackedOffset + ackedLength
+        while offset < self.size:
+            length = min(nextSize(), self.size - offset)
+            yield part, offset, length
+            part, offset = part + 1, offset + length
+
+
+class RangeDownloadState(object):
+    """
+    on-disk state of a download in parallel byte ranges: identity of the remote file (size, ETag, Last-Modified)
+    and the ranges already written into the preallocated partial file. Saved after every completed range, so that
+    an interrupted download only fetches the missing ranges
+
+    :param Path path: state file (json), None to keep the state in memory only
+    :param dict identity: size, etag and lastModified of the remote file
+    :param int rangeSize: size in bytes of the ranges
+    """
+
+    def __init__(self, path, identity, rangeSize):
+        self.path = Path(path) if path else None
+        self.identity = identity
+        self.size = identity['size']
+        self.rangeSize = rangeSize
+        self.done = set()  # start offsets of the completed ranges
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, identity, rangeSize):
+        """
+        load the state if it exists and describes the same remote file, otherwise start a new one
+
+        :return: the state
+        :rtype: RangeDownloadState
+        """
+
+        state = cls(path, identity, rangeSize)
+        if state.path is None or not state.path.is_file():
+            return state
+        try:
+            with state.path.open('r') as f:
+                saved = json.load(f)
+        except ValueError:
+            logger.warning('unreadable download state %s, starting again' % state.path)
+            return state
+        if saved.get('identity') != identity:
+            logger.info('remote file changed since %s was saved, starting again' % state.path)
+            return state
+        state.rangeSize = saved['rangeSize']
+        state.done = set(saved['done'])
+        logger.info('resuming download: %d ranges already written' % len(state.done))
+        return state
+
+    def ranges(self):
+        """
+        :return: all ranges as (start, end) with end inclusive, as in the Range header
+        :rtype: list
+        """
+
+        return [(start, min(start + self.rangeSize, self.size) - 1) for start in range(0, self.size, self.rangeSize)]
+
+    def pendingRanges(self):
+        return [r for r in self.ranges() if r[0] not in self.done]
+
+    def complete(self, start):
+        """
+        record a written range and save the state
+        """
+
+        with self._lock:
+            self.done.add(start)
+            self.save()
+
+    def reset(self):
+        with self._lock:
+            self.done.clear()
+            self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        saved = dict(identity=self.identity, rangeSize=self.rangeSize, done=sorted(self.done))
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w') as f:
+            json.dump(saved, f)
+        os.replace(str(tmp), str(self.path))
+
+    def delete(self):
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+
+def responseValidator(headers):
+    """
+    :param dict headers: response headers
+    :return: the validator usable in If-Range (strong ETag, else Last-Modified), None if there is none
+    :rtype: str
+    """
+
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+def saveValidator(path, headers):
+    """
+    store the validator of a response next to the partial file of a sequential download, the download is only
+    resumed if the remote file still has that validator
+
+    :param Path path: validator file
+    :param dict headers: headers of the response written to the partial file
+    :return: the validator, None if the response has none (the download cannot be resumed safely)
+    :rtype: str
+    """
+
+    validator = responseValidator(headers)
+    if validator is None:
+        if path.exists():
+            path.unlink()
+        return None
+    tmp = path.with_name(path.name + '.tmp')
+    with tmp.open('w') as f:
+        f.write(validator)
+    os.replace(str(tmp), str(path))
+    return validator
+
+
+def loadValidator(path):
+    """
+    :param Path path: validator file
+    :return: the stored validator, None if there is none
+    :rtype: str
+    """
+
+    if not path.is_file():
+        return None
+    with path.open('r') as f:
+        return f.read().strip() or None
+
+
+class ChunkReader(object):
+    """
+    reads the chunks of a file on a background thread into a bounded queue, so that reading the next chunks
+    overlaps with sending the current ones. Chunks are zero-copy memoryview slices of a memory map of the file;
+    hand them back with release() once sent. Use as a context manager::
+
+        with ChunkReader(fp, manifest.pendingChunks(), queueSize=4) as reader:
+            for part, offset, view in reader:
+                ...
+                reader.release(view)
+
+    :param Path fp: the file
+    :param chunks: iterable of (part, offset, length)
+    :param int queueSize: maximum number of chunks read ahead
+    :param maxBytes: budget in bytes of the chunks read and not yet released, int or function returning it
+        (evaluated for every chunk, e.g. when the chunk size changes), None for no budget. One chunk is always read
+        even if it exceeds the budget
+    """
+
+    def __init__(self, fp, chunks, queueSize=2, maxBytes=None):
+        self.fp = Path(fp)
+        self.chunks = chunks
+        self.maxBytes = maxBytes
+        self.inFlight = 0  # bytes of the chunks read and not yet released
+        self._queue = queue.Queue(maxsize=max(1, queueSize))
+        self._stop = threading.Event()
+        self._released = threading.Condition()
+        self._file = None
+        self._mm = None
+        self._view = None
+
+    def __enter__(self):
+        self._file = self.fp.open('rb')
+        if self.fp.stat().st_size > 0:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mm)
+        thread = threading.Thread(target=self._read)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        with self._released:
+            self._released.notify_all()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._view is not None:
+            self._view.release()
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                logger.debug('chunk views of %s still referenced, map closed on garbage collection' % self.fp)
+        self._file.close()
+
+    def _read(self):
+        try:
+            for part, offset, length in self.chunks:
+                if self._stop.is_set():
+                    return
+                if hasattr(mmap, 'MADV_WILLNEED'):
+                    # ask the OS to start reading the chunk from disk now
+                    start = offset - offset % mmap.PAGESIZE
+                    self._mm.madvise(mmap.MADV_WILLNEED, start, offset + length - start)
+                if not self._reserve(length):
+                    return
+                self._queue.put((part, offset, self._view[offset:offset + length]))
+            self._queue.put(None)
+        except Exception as e:
+            self._queue.put(e)
+
+    def _budget(self):
+        return self.maxBytes() if callable(self.maxBytes) else self.maxBytes
+
+    def _reserve(self, length):
+        # wait until the chunk fits into the budget, False if the reader is closed meanwhile
+        with self._released:
+            while self.inFlight and self._budget() is not None and self.inFlight + length > self._budget():
+                if self._stop.is_set():
+                    return False
+                self._released.wait(0.5)
+            self.inFlight += length
+        return not self._stop.is_set()
+
+    def release(self, view):
+        """
+        release a chunk once sent and return its bytes to the budget
+
+        :param memoryview view: the chunk
+        """
+
+        nbytes = view.nbytes
+        view.release()
+        with self._released:
+            self.inFlight -= nbytes
+            self._released.notify_all()
+
+    def __iter__(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+class ChunkUploadStats(object):
+    """
+    per chunk latency and aggregate throughput of a chunked upload, filled by VSDConnecter.chunkFileUpload.
+    Thread safe.
+    """
+
+    def __init__(self):
+        self.chunks = list()  # (part, bytes, seconds)
+        self.start = time.time()
+        self.end = None
+        self._lock = threading.Lock()
+
+    def add(self, part, nbytes, seconds):
+        with self._lock:
+            self.chunks.append((part, nbytes, seconds))
+            self.end = time.time()
+
+    @property
+    def totalBytes(self):
+        return sum(c[1] for c in self.chunks)
+
+    @property
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+    @property
+    def mbPerSecond(self):
+        elapsed = self.elapsed
+        return self.totalBytes / 1024. / 1024. / elapsed if elapsed > 0 else 0.
+
+    @property
+    def meanLatency(self):
+        return sum(c[2] for c in self.chunks) / len(self.chunks) if self.chunks else 0.
+
+    def summary(self):
+        """
+        :return: number of chunks, bytes, elapsed seconds, MB/s, mean / max chunk latency
+        :rtype: dict
+        """
+
+        return dict(chunks=len(self.chunks), bytes=self.totalBytes, seconds=self.elapsed,
+                    mbPerSecond=self.mbPerSecond, meanLatency=self.meanLatency,
+                    maxLatency=max([c[2] for c in self.chunks] or [0.]))
+
+
+class UploadReport(object):
+    """
+    files and bytes uploaded and skipped (already on the server) by uploads with skipIn. Thread safe.
+    """
+
+    def __init__(self):
+        self.uploadedFiles = list()
+        self.skippedFiles = list()
+        self.uploadedBytes = 0
+        self.skippedBytes = 0
+        self._lock = threading.Lock()
+
+    def uploaded(self, fp, nbytes):
+        with self._lock:
+            self.uploadedFiles.append(fp)
+            self.uploadedBytes += nbytes
+
+    def skipped(self, fp, nbytes):
+        with self._lock:
+            self.skippedFiles.append(fp)
+            self.skippedBytes += nbytes
+
+    def summary(self):
+        """
+        :return: number of files and bytes uploaded and skipped
+        :rtype: dict
+        """
+
+        return dict(uploadedFiles=len(self.uploadedFiles), uploadedBytes=self.uploadedBytes,
+                    skippedFiles=len(self.skippedFiles), skippedBytes=self.skippedBytes)
+
+    def __repr__(self):
+        return '<UploadReport: {0[uploadedFiles]} files ({0[uploadedBytes]} bytes) uploaded, ' \
+               '{0[skippedFiles]} files ({0[skippedBytes]} bytes) skipped>'.format(self.summary())
+
+
+class AdaptiveChunkSizer(object):
+    """
+    chooses the size of the next chunk from the measured round trip time of the previous ones: starts small,
+    doubles the size while a chunk takes less than half of targetSeconds (per request overhead dominates) and
+    halves it when a chunk takes more than twice targetSeconds (risk of timeouts), within [minimum, maximum].
+    Pass it as chunksize to VSDConnecter.chunkFileUpload; parameters() gives the chosen values for logging.
+
+    :param int initial: size of the first chunk in bytes
+    :param int minimum: smallest chunk size in bytes
+    :param int maximum: largest chunk size in bytes (the server limit is 100 MB)
+    :param float targetSeconds: wanted duration of a chunk request
+    """
+
+    def __init__(self, initial=1024 * 1024, minimum=256 * 1024, maximum=64 * 1024 * 1024, targetSeconds=2.):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.targetSeconds = targetSeconds
+        self.size = max(minimum, min(initial, maximum))
+        self.lastThroughput = None  # bytes / s
+        self.bestThroughput = None
+        self.changes = list()  # (chunk number, new size)
+        self.measured = 0
+        self._lock = threading.Lock()
+
+    def nextSize(self):
+        return self.size
+
+    def record(self, nbytes, seconds):
+        """
+        account for a sent chunk and adapt the size of the next ones
+
+        :param int nbytes: chunk size
+        :param float seconds: round trip time of the chunk request
+        """
+
+        with self._lock:
+            self.measured += 1
+            if seconds <= 0:
+                return
+            throughput = nbytes / seconds
+            self.lastThroughput = throughput
+            self.bestThroughput = max(throughput, self.bestThroughput or 0)
+            if nbytes < self.size:
+                # last (short) chunk or chunk read before the previous change
+                return
+            size = self.size
+            if seconds < self.targetSeconds / 2.:
+                size = min(self.maximum, size * 2)
+            elif seconds > self.targetSeconds * 2.:
+                size = max(self.minimum, size // 2)
+            if size != self.size:
+                logger.debug('chunk size %d -> %d (%.2f s, %.2f MB/s)' % (self.size, size, seconds,
+                                                                          throughput / 1024. / 1024.))
+                self.size = size
+                self.changes.append((self.measured, size))
+
+    def parameters(self):
+        """
+        :return: current chunk size, limits, target duration, last / best throughput (MB/s), number of changes
+        :rtype: dict
+        """
+
+        mb = 1024. * 1024.
+        return dict(chunksize=self.size, minimum=self.minimum, maximum=self.maximum, targetSeconds=self.targetSeconds,
+                    lastMBPerSecond=self.lastThroughput / mb if self.lastThroughput else None,
+                    bestMBPerSecond=self.bestThroughput / mb if self.bestThroughput else None,
+                    changes=len(self.changes))
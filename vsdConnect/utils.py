@@ -4,21 +4,21 @@ from vsdConnect import models
 import logging
 logger = logging.getLogger(__name__)
 
-def containedObjectsPreviewToDisk(c,folderData, outputfolder, name, exc_raise = True):
-    fullObjects = []
-    for object in folderData.containedObjects:
-        try:
-            objId = os.path.basename(object.selfUrl)
-            objectFull = c.getObject(object.selfUrl)
-            fullObjects.append(objectFull)
-            for i, preview in enumerate(c.downloadObjectPreviewImages()):
-                with open(os.path.join(outputfolder, "%s_%s_%02d.jpg" % (name, objId, i))) as f:
-                    f.write(preview)
-        except Exception as e:
-            if exc_raise:
-                raise
-            else:
-                print e
+def containedObjectsPreviewToDisk(c,folderData, outputfolder, name, exc_raise = True, thumbnail = True):
+    # objects and previews are retrieved concurrently (see c.previewCache to keep the images between runs)
+    fullObjects, errors = c.getObjectsBulk([object.selfUrl for object in folderData.containedObjects or []])
+    for selfUrl, e in errors.items():
+        if exc_raise:
+            raise e
+        else:
+            print(e)
+    fullObjects = list(fullObjects.values())
+    previews = c.getPreviewImages(fullObjects, thumbnail=thumbnail)
+    for objectFull in fullObjects:
+        objId = os.path.basename(objectFull.selfUrl)
+        for i, preview in enumerate(previews[objectFull.selfUrl]):
+            with open(os.path.join(outputfolder, "%s_%s_%02d.jpg" % (name, objId, i)), 'wb') as f:
+                f.write(preview)
     return fullObjects
 
 
@@ -0,0 +1,209 @@
+#!/usr/bin/python
+"""
+=======
+INFOS
+=======
+* extraction of ZIP archives while they are downloaded (object downloads of connectVSD)
+* python version: 3
+
+"""
+
+import os
+import zlib
+import struct
+import logging
+
+from pathlib import Path
+from zipfile import BadZipFile
+
+logger = logging.getLogger(__name__)
+
+LOCAL_HEADER = b'PK\x03\x04'
+CENTRAL_HEADER = b'PK\x01\x02'
+END_RECORD = b'PK\x05\x06'
+ZIP64_END_RECORD = b'PK\x06\x06'
+DATA_DESCRIPTOR = b'PK\x07\x08'
+
+STORED = 0
+DEFLATED = 8
+
+
+class _ChunkStream(object):
+    # reads bytes from an iterator of chunks, data can be pushed back
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+
+    def _fill(self, n):
+        while len(self.buffer) < n:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return False
+            self.buffer.extend(chunk)
+        return True
+
+    def read(self, n):
+        # exactly n bytes, less at the end of the stream
+        self._fill(n)
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def readSome(self, n):
+        # up to n bytes, empty at the end of the stream
+        if not self.buffer:
+            self._fill(1)
+        return self.read(min(n, len(self.buffer)))
+
+    def unread(self, data):
+        self.buffer[:0] = data
+
+
+class ZipStreamExtractor(object):
+    """
+    extracts the members of a ZIP archive while it is read from a stream of chunks (e.g. a streamed response),
+    using the local file headers: the archive is neither kept in memory nor written to disk. Deflated members are
+    supported with or without data descriptors, stored members only with their sizes in the local header; Zip64
+    sizes are read and the CRC of every member is checked::
+
+        extractor = ZipStreamExtractor(Path('CT'), memberFilter='.dcm')
+        files = extractor.extract(res.iter_content(1024 * 1024))
+
+    :param Path target: directory the members are extracted to
+    :param memberFilter: None for all members, a suffix or tuple of suffixes ('.dcm', '.mha') or a function
+        called with the member name returning True for the members to extract
+    :param int bufsize: size of the reads from the stream
+    """
+
+    def __init__(self, target, memberFilter=None, bufsize=1024 * 1024):
+        self.target = Path(target)
+        self.bufsize = bufsize
+        if memberFilter is None or callable(memberFilter):
+            self.memberFilter = memberFilter
+        else:
+            suffixes = tuple(s.lower() for s in ((memberFilter,) if isinstance(memberFilter, str) else memberFilter))
+            self.memberFilter = lambda name: name.lower().endswith(suffixes)
+
+    def _targetPath(self, name):
+        # local path of a member, members outside of the target directory are refused
+        fp = Path(self.target, *[p for p in name.replace('\\', '/').split('/') if p not in ('', '.')])
+        root = os.path.abspath(str(self.target))
+        if os.path.commonpath([root, os.path.abspath(str(fp))]) != root or '..' in fp.parts:
+            raise BadZipFile('member {0} outside of the target directory'.format(name))
+        return fp
+
+    def extract(self, chunks):
+        """
+        extract the archive
+
+        :param chunks: iterable of bytes, the archive
+        :return: the extracted files
+        :rtype: list of Path
+        """
+
+        stream = _ChunkStream(chunks)
+        extracted = list()
+        while True:
+            signature = stream.read(4)
+            if len(signature) < 4 or signature in (CENTRAL_HEADER, END_RECORD, ZIP64_END_RECORD):
+                break
+            if signature != LOCAL_HEADER:
+                raise BadZipFile('unexpected record {0!r} in the archive'.format(signature))
+            fp = self._member(stream)
+            if fp is not None:
+                extracted.append(fp)
+        logger.debug('extracted {0} members to {1}'.format(len(extracted), self.target))
+        return extracted
+
+    def _member(self, stream):
+        header = stream.read(26)
+        if len(header) < 26:
+            raise BadZipFile('truncated local file header')
+        _, flags, method, _, _, crc, csize, usize, nameLength, extraLength = struct.unpack('<HHHHHIIIHH', header)
+        name = stream.read(nameLength).decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = stream.read(extraLength)
+        zip64 = False
+        while len(extra) >= 4:
+            tag, size = struct.unpack('<HH', extra[:4])
+            if tag == 0x0001:
+                zip64 = True
+                values = list(struct.unpack('<%dQ' % (min(size, 16) // 8), extra[4:4 + min(size, 16)]))
+                if usize == 0xFFFFFFFF and values:
+                    usize = values.pop(0)
+                if csize == 0xFFFFFFFF and values:
+                    csize = values.pop(0)
+            extra = extra[4 + size:]
+        if flags & 0x1:
+            raise BadZipFile('encrypted member {0} not supported'.format(name))
+        hasDescriptor = bool(flags & 0x8)
+
+        wanted = not name.endswith('/') and (self.memberFilter is None or self.memberFilter(name))
+        if name.endswith('/') and self.memberFilter is None:
+            fp = self._targetPath(name)
+            if not fp.exists():
+                fp.mkdir(parents=True, exist_ok=True)
+        if not wanted and not hasDescriptor:
+            # size known in advance: skip without decompressing
+            remaining = csize
+            while remaining:
+                skipped = len(stream.readSome(min(self.bufsize, remaining)))
+                if not skipped:
+                    raise BadZipFile('truncated member {0}'.format(name))
+                remaining -= skipped
+            return None
+
+        fp = self._targetPath(name) if wanted else None
+        out = None
+        if fp is not None:
+            if not fp.parent.exists():
+                fp.parent.mkdir(parents=True, exist_ok=True)
+            out = fp.open('wb')
+        try:
+            computed = self._copyData(stream, name, method, csize, hasDescriptor, out)
+        finally:
+            if out is not None:
+                out.close()
+
+        if hasDescriptor:
+            descriptor = stream.read(4)
+            if descriptor != DATA_DESCRIPTOR:
+                stream.unread(descriptor)
+            crc, = struct.unpack('<I', stream.read(4))
+            stream.read(16 if zip64 else 8)
+        if computed != crc:
+            if fp is not None:
+                fp.unlink()
+            raise BadZipFile('CRC error in member {0}'.format(name))
+        return fp
+
+    def _copyData(self, stream, name, method, csize, hasDescriptor, out):
+        # copy (inflate) the member data to out, returns the CRC of the uncompressed data
+        crc = 0
+        if method == STORED:
+            if hasDescriptor and not name.endswith('/'):
+                # the end of the data cannot be found without the size (directories have no data)
+                raise BadZipFile('stored member {0} with data descriptor not supported'.format(name))
+            remaining = csize
+            while remaining:
+                data = stream.readSome(min(self.bufsize, remaining))
+                if not data:
+                    raise BadZipFile('truncated member {0}'.format(name))
+                remaining -= len(data)
+                crc = zlib.crc32(data, crc)
+                if out is not None:
+                    out.write(data)
+        elif method == DEFLATED:
+            inflater = zlib.decompressobj(-15)
+            while not inflater.eof:
+                data = stream.readSome(self.bufsize)
+                if not data:
+                    raise BadZipFile('truncated member {0}'.format(name))
+                data = inflater.decompress(data)
+                crc = zlib.crc32(data, crc)
+                if out is not None:
+                    out.write(data)
+            stream.unread(inflater.unused_data)
+        else:
+            raise BadZipFile('compression method {0} of member {1} not supported'.format(method, name))
+        return crc & 0xFFFFFFFF